@@ -363,7 +363,8 @@ class ASCII_File:
 
         **Arguments**:
             - *S1* = PySHEMAT.Shemat_file : original SHEMAT object (for dimensions, etc.)
-            - *property_xy* = 2D property array, created with PySHEMAT
+            - *property_xy* = 2D property array, created with PySHEMAT (1-D list or
+            2-D array[y,x])
             
         **Optional Keywords**:
             - *set_nodata_value* = True/ False : set Nodata value for a defined range
@@ -382,6 +383,8 @@ class ASCII_File:
                        'NODATA_value' : -9999
                         }
 
+        # resize to 1-D list
+        property_xy = np.ravel(property_xy).tolist()
         # set nodata value, if required
         if kwds.has_key('set_nodata_value') and kwds['set_nodata_value']:
             for i,t in enumerate(property_xy):
@@ -448,9 +451,11 @@ class ASCII_File:
         using the original SHEMAT object to set the header properties
         !!! ATTENTION: ASCII grid only for regular space grids with dx = dy! 
         S1 : Shemat Object
-        property_xy : property array (1D) with 2.5 D grid info as written by various
-        Shemat_file methods, e.g. mean properties
+        property_xy : property array (1D list or 2D array[y,x]) with 2.5 D grid info as
+        written by various Shemat_file methods, e.g. mean properties
         """        
+        # resize to 1-D list
+        property_xy = np.ravel(property_xy).tolist()
         # this has to be defined:
         self.header = {'ncol' : int(S1.get("IDIM")),
                        'nrow' : int(S1.get("JDIM")),
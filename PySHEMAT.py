@@ -19,12 +19,240 @@ Available online 21 October 2011, ISSN 0098-3004, 10.1016/j.cageo.2011.10.011.
 
 """
 import os, sys
+import shutil # permissions of replaced files
 import re # for regular expression fit, neccessary for stupid nlo files
+import zlib # checksums of cached arrays
+import hashlib # content hash for cache files
+import mmap # lazy reading of large files
+from cStringIO import StringIO
 # from matplotlib import use
 # use("Agg")
 import matplotlib as m
 import numpy as np
 
+class GridGeometry:
+    """Geometry of the (rectilinear) grid of a SHEMAT model
+    
+    Cell widths, boundaries and centres in x, y and z-direction, the model
+    extent and the volume of all cells are computed once from the arrays DELX,
+    DELY and DELZ and stored as numpy arrays. All positions are relative to the
+    model origin. The geometry of a SHEMAT model is created and cached with
+    Shemat_file.get_geometry.
+    
+    **Arguments**:
+        - *delx, dely, delz* = 1-D arrays : cell widths in x, y and z-direction
+    """
+    def __init__(self, delx, dely, delz):
+        """Initialization of grid geometry
+        
+        **Arguments**:
+            - *delx, dely, delz* = 1-D arrays : cell widths in x, y and z-direction
+        """
+        self.delx = np.array(delx, dtype=np.float64)
+        self.dely = np.array(dely, dtype=np.float64)
+        self.delz = np.array(delz, dtype=np.float64)
+        self.idim = len(self.delx)
+        self.jdim = len(self.dely)
+        self.kdim = len(self.delz)
+        # cell boundaries (cumulative sum of widths)
+        self.boundaries_x = np.append(0., np.cumsum(self.delx))
+        self.boundaries_y = np.append(0., np.cumsum(self.dely))
+        self.boundaries_z = np.append(0., np.cumsum(self.delz))
+        # cell centres
+        b = self.boundaries_x
+        self.centre_x = (b[1:] - b[:-1]) / 2. + b[:-1]
+        b = self.boundaries_y
+        self.centre_y = (b[1:] - b[:-1]) / 2. + b[:-1]
+        b = self.boundaries_z
+        self.centre_z = (b[1:] - b[:-1]) / 2. + b[:-1]
+        # model extent
+        self.extent_x = self.boundaries_x.max() - self.boundaries_x.min()
+        self.extent_y = self.boundaries_y.max() - self.boundaries_y.min()
+        self.extent_z = self.boundaries_z.max() - self.boundaries_z.min()
+        # volume of all cells as 3-D array[z,y,x] (SHEMAT array order)
+        self.block_volume = self.delx[np.newaxis, np.newaxis, :] * \
+                            self.dely[np.newaxis, :, np.newaxis] * \
+                            self.delz[:, np.newaxis, np.newaxis]
+
+
+class ObservationStencil:
+    """Interpolation stencil for a fixed set of observation points
+    
+    For fixed observation points (e.g. temperature measurements in wells), the
+    eight surrounding cell centres and the weights of the trilinear interpolation
+    (see Shemat_file.get_values_xyz) are the same for all properties and all
+    simulations with the same grid. They are determined once and stored in a
+    sparse matrix (self.matrix, scipy.sparse, n_points x n_cells), so that the
+    values at all points are obtained with one sparse matrix-vector product,
+    for example for many results of a stochastic simulation:
+    
+    stencil = ObservationStencil(S1, xs, ys, zs)
+    temps = stencil.apply([S.get_array("TEMP") for S in shemat_results])
+    
+    Values at points outside of the model range are set to NaN.
+    
+    **Arguments**:
+        - *shemat_file* = Shemat_file object : model with grid geometry (and origin)
+        - *xs, ys, zs* = 1-D arrays (or lists) of floats : positions of points
+    
+    **Optional Keywords**:
+        - *relative* = True/ False: relative to model origin (i.e.: not in real-world
+        coordinates).
+        - *edge* = 'clamp', 'extrapolate' : treatment of points in the edge cells
+        (default: 'clamp')
+    """
+    def __init__(self, shemat_file, xs, ys, zs, **kwds):
+        """Initialization of interpolation stencil (see class documentation)"""
+        from scipy import sparse
+        (index, valid) = shemat_file.get_interpolation_index(xs, ys, zs, **kwds)
+        ((i0, i1, dx, delx), (j0, j1, dy, dely), (k0, k1, dz, delz)) = index
+        geometry = shemat_file.get_geometry()
+        nx = geometry.idim
+        nxy = geometry.idim * geometry.jdim
+        n_cells = nxy * geometry.kdim
+        # relative position between cell centres
+        tx = dx / delx
+        ty = dy / dely
+        tz = dz / delz
+        columns = []
+        weights = []
+        for (i, wx) in ((i0, 1. - tx), (i1, tx)):
+            for (j, wy) in ((j0, 1. - ty), (j1, ty)):
+                for (k, wz) in ((k0, 1. - tz), (k1, tz)):
+                    columns.append(i + nx * j + nxy * k)
+                    weights.append(wx * wy * wz)
+        columns = np.array(columns).T
+        weights = np.array(weights).T
+        weights[~valid] = 0.
+        rows = np.repeat(np.arange(len(valid)), 8)
+        self.matrix = sparse.csr_matrix((weights.ravel(), (rows, columns.ravel())),
+                                        shape = (len(valid), n_cells))
+        self.valid = valid
+
+    def apply(self, values):
+        """Interpolate property values at the observation points
+        
+        **Arguments**:
+            - *values* = 1-D array with property values (n_cells) or 2-D array/
+            list of arrays with values of several simulations (n_members x n_cells)
+        
+        **Returns**:
+            1-D array with values at points (n_points) or 2-D array (n_members x n_points)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            result = self.matrix.dot(values)
+        else:
+            result = self.matrix.dot(values.reshape(len(values), -1).T).T
+        result[..., ~self.valid] = np.nan
+        return result
+
+
+class XYGridInterpolator:
+    """Interpolation of scattered (x,y) data onto the (x,y) grid of a SHEMAT model
+    
+    The Delaunay triangulation (or KD-tree for nearest neighbour interpolation) of
+    the data points is determined once and the interpolation weights of all grid
+    points are stored in a sparse matrix (self.matrix, scipy.sparse, n_grid x n_points).
+    Different value sets at the same data points (e.g. surface temperature and heat
+    flow at the same stations) are then interpolated with one weighted sum each
+    (see self.interpolate). The grid points are the same as in
+    Shemat_file.interpolate_values_on_xy_grid: idim x jdim points, regularly
+    spaced over the model extent. Values of grid points outside of the convex
+    hull of the data points are set to NaN for linear interpolation.
+    
+    **Arguments**:
+        - *shemat_file* = Shemat_file object : model with grid geometry (and origin)
+        - *x_coords* = 1D-array : coordinate values of data points in x-direction
+        - *y_coords* = 1D-array : coordinate values of data points in y-direction
+    
+    **Optional Keywords**:
+        - *method* = 'linear', 'nearest' : interpolation method (default: 'linear')
+        - *relative* = True/ False: relative to model origin (not in real-world coordinates)
+    """
+    def __init__(self, shemat_file, x_coords, y_coords, **kwds):
+        """Initialization of interpolation weights (see class documentation)"""
+        from scipy import sparse, spatial
+        self.method = kwds.get('method', 'linear')
+        if self.method not in ('linear', 'nearest'):
+            raise ValueError("method must be 'linear' or 'nearest'")
+        if kwds.has_key('relative') and kwds['relative']:
+            # get value relative to model origin, not in real-world coordinates!
+            self.origin = (0, 0)
+        else:
+            try:
+                shemat_file.origin_z
+            except AttributeError:
+                shemat_file.get_model_origin()
+            self.origin = (shemat_file.origin_x, shemat_file.origin_y)
+        self.geometry = shemat_file.get_geometry()
+        self.x_coords = np.array(x_coords, dtype=np.float64).ravel()
+        self.y_coords = np.array(y_coords, dtype=np.float64).ravel()
+        # generate regular grid to interpolate data
+        xi = np.linspace(self.origin[0], self.origin[0] + self.geometry.extent_x, self.geometry.idim)
+        yi = np.linspace(self.origin[1], self.origin[1] + self.geometry.extent_y, self.geometry.jdim)
+        xi, yi = np.meshgrid(xi, yi)
+        grid_points = np.column_stack((xi.ravel(), yi.ravel()))
+        data_points = np.column_stack((self.x_coords, self.y_coords))
+        n_grid = len(grid_points)
+        if self.method == 'nearest':
+            (dist, columns) = spatial.cKDTree(data_points).query(grid_points)
+            columns = columns.reshape(-1, 1)
+            weights = np.ones(columns.shape)
+            self.valid = np.ones(n_grid, dtype=bool)
+        else:
+            # barycentric coordinates of grid points in the Delaunay triangles
+            triangulation = spatial.Delaunay(data_points)
+            simplex = triangulation.find_simplex(grid_points)
+            self.valid = simplex >= 0
+            transform = triangulation.transform[simplex]
+            b = np.einsum('ijk,ik->ij', transform[:, :2], grid_points - transform[:, 2])
+            weights = np.column_stack((b, 1. - b.sum(axis=1)))
+            columns = triangulation.simplices[simplex]
+            weights[~self.valid] = 0.
+        rows = np.repeat(np.arange(n_grid), columns.shape[1])
+        self.matrix = sparse.csr_matrix((weights.ravel(), (rows, columns.ravel())),
+                                        shape = (n_grid, len(data_points)))
+
+    def is_valid_for(self, shemat_file, x_coords, y_coords, **kwds):
+        """Check if the interpolation weights can be used for a model and data points
+        
+        **Returns**:
+            True if grid geometry, origin, data points and method are the same
+        """
+        if kwds.has_key('relative') and kwds['relative']:
+            origin = (0, 0)
+        else:
+            try:
+                origin = (shemat_file.origin_x, shemat_file.origin_y)
+            except AttributeError:
+                return False
+        return self.geometry is shemat_file.get_geometry() and \
+            self.origin == origin and \
+            self.method == kwds.get('method', 'linear') and \
+            np.array_equal(self.x_coords, np.ravel(x_coords)) and \
+            np.array_equal(self.y_coords, np.ravel(y_coords))
+
+    def interpolate(self, z_values):
+        """Interpolate values at the data points onto the grid
+        
+        **Arguments**:
+            - *z_values* = 1D-array : values at data points (or 2-D array with
+            several value sets, n_sets x n_points)
+        
+        **Returns**:
+            1-D array with interpolated values (x-dominance 2-D grid), or 2-D array
+            (n_sets x n_grid)
+        """
+        z_values = np.asarray(z_values, dtype=np.float64)
+        if z_values.ndim == 1:
+            result = self.matrix.dot(z_values)
+        else:
+            result = self.matrix.dot(z_values.T).T
+        result[..., ~self.valid] = np.nan
+        return result
+
+
 class Shemat_file:
     """Class for SHEMAT simulation input and output files
     
@@ -54,18 +282,52 @@ class Shemat_file:
         **Optional keywords**:
             - *offscreen* = True/False: set variables for offscreen rendering, e.g. to create plots on
                 a remote machine via ssh
+            - *parse_all* = True/False: parse all variables directly when the file is
+                loaded (see self.parse_all)
+            - *cache* = True/False: load parsed variables from a binary cache file
+                (filename + '.npz') or create it, if it does not exist or is outdated
+                (see self.load_cache and self.save_cache); if the cache file is
+                valid, the file is opened lazily (see self.open_lazy)
+            - *lazy* = True/False: do not read all lines of the file, but only the
+                variables that are accessed (see self.open_lazy); can be combined
+                with cache
         """
+        # cache of decoded arrays (see self.get_var_values and self.flush) and
+        # checksums of arrays returned as views (see self.mark_modified_arrays)
+        self.array_cache = {}
+        self.array_checksums = {}
+        self.dirty_vars = {}
+        # output format of variables (see self.set_float_format)
+        self.float_formats = {}
         if filename == '':
             print "create empty file"
             if kwds.has_key('new_filename'): self.filename = kwds['new_filename']
         else:
-            self.filelines = self.read_file(filename)
             self.filename = filename
+            cache = kwds.has_key('cache') and kwds['cache']
+            # with a valid cache file, the SHEMAT file itself is not read
+            if not (cache and self.load_cache(filename)):
+                if kwds.has_key('lazy') and kwds['lazy']:
+                    self.open_lazy(filename)
+                else:
+                    self.filelines = self.read_file(filename)
+                if cache:
+                    self.parse_all()
+                    self.save_cache(filename)
+                elif kwds.has_key('parse_all') and kwds['parse_all']:
+                    self.parse_all()
             self.idim = int(self.get("IDIM"))
             self.jdim = int(self.get("JDIM"))
             self.kdim = int(self.get("KDIM"))
         if kwds.has_key('offscreen') and kwds['offscreen']:
             m.use('Agg')
+
+    def __getattr__(self, name):
+        """Read the file lines of a lazily opened file on first access"""
+        if name == 'filelines' and self.__dict__.has_key('section_index'):
+            self.load_filelines()
+            return self.__dict__['filelines']
+        raise AttributeError(name)
                 
     def read_file(self, filename):
         """Open and read a SHEMAT .nml or .nlo file
@@ -85,12 +347,609 @@ class Shemat_file:
         # check if number of entries correct
         filelines = file.readlines()
         file.close()
-        # set local variables
+        # set local variables and build index of variable positions
+        self.filelines = filelines
+        self.build_index()
         return filelines
+
+    def open_lazy(self, filename, section_index=None):
+        """Open a SHEMAT file without reading all lines
+        
+        The file is mapped into memory (mmap) and the positions of all section
+        headers ("# NAME" at the beginning of a line) are determined with a
+        byte-level search. The positions are stored in the object variable
+        self.section_index as a dictionary {NAME : (start, end)} with the byte
+        range of the data lines. Variables are then only read and decoded when
+        they are accessed (self.get, self.get_array, ...).
+        
+        The lines of the whole file (self.filelines) are only read if they are
+        required, e.g. to change variables with self.set or to write the file
+        (see self.load_filelines).
+        
+        **Arguments**:
+            - *filename* = string: filename
+        
+        **Optional Arguments**:
+            - *section_index* = dictionary : section positions determined before
+            (e.g. stored in the cache file, see self.load_cache); the file is then
+            not searched for headers
+        """
+        try:
+            file = open(filename, "r")
+        except IOError, (nr, string_err):
+            print "Can not open file " + filename + ": " + string_err + " Err#" + str(nr)
+            print "Please check file name and directory and try again"
+            raise IOError
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            # empty file: can not be mapped
+            data = ''
+        file.close()
+        if section_index is None:
+            section_index = self.index_sections(data)
+        self.mmap_data = data
+        self.section_index = section_index
+
+    def index_sections(self, data):
+        """Determine the byte ranges of all sections in the content of a SHEMAT file
+        
+        **Arguments**:
+            - *data* = string or mmap : content of SHEMAT file
+        
+        **Returns**:
+            Dictionary {NAME : (start, end)} with the byte range of the data lines
+            of each variable
+        """
+        section_index = {}
+        size = len(data)
+        if data[0:1] == "#":
+            header = 0
+        else:
+            header = data.find("\n#")
+            if header != -1: header += 1
+        while header != -1:
+            line_end = data.find("\n", header)
+            if line_end == -1:
+                line_end = size
+            next_header = data.find("\n#", line_end)
+            if next_header == -1:
+                end = size
+            else:
+                end = next_header + 1
+            name = data[header+1:line_end].strip()
+            if not section_index.has_key(name):
+                section_index[name] = (min(line_end + 1, size), end)
+            header = next_header if next_header == -1 else next_header + 1
+        return section_index
+
+    def load_filelines(self):
+        """Read all lines of a lazily opened file (see self.open_lazy)
+        
+        **Returns**:
+            List of lines in the file
+        """
+        filelines = StringIO(self.mmap_data[:]).readlines()
+        if isinstance(self.mmap_data, mmap.mmap):
+            self.mmap_data.close()
+        del self.mmap_data
+        del self.section_index
+        # keep cached and changed arrays when the index is built
+        self.filelines = filelines
+        self.index_filelines = filelines
+        return filelines
+
+    def build_index(self):
+        """Build an index of all variable positions in the SHEMAT file
+        
+        Every variable in a SHEMAT file is defined by a header line "# NAME",
+        followed by one or more data lines. The positions of all headers are
+        determined in one pass through self.filelines and stored in the object
+        variable self.var_index as a dictionary {NAME : (header, end)}, so that
+        the data lines of a variable are self.filelines[header+1:end]. With this
+        index, variables are accessed in constant time instead of scanning the
+        whole file for each access. The index is kept up to date when variables
+        are changed with self.set_array.
+        
+        Cached arrays are discarded if self.filelines has been replaced; arrays
+        that have been changed but are not yet written to the file lines (see
+        self.flush) are kept if self.filelines has only been extended.
+        
+        **Returns**:
+            Dictionary with line ranges of all variables
+        """
+        if self.__dict__.has_key('section_index'):
+            self.load_filelines()
+        if self.__dict__.get('index_filelines') is not self.filelines:
+            self.array_cache = {}
+            self.array_checksums = {}
+            self.dirty_vars = {}
+            self.reset_geometry()
+        else:
+            self.mark_modified_arrays()
+            for name in self.array_cache.keys():
+                if not self.dirty_vars.has_key(name):
+                    del self.array_cache[name]
+                    self.array_checksums.pop(name, None)
+        self.var_index = {}
+        # parsed variables are only valid for the indexed lines
+        if self.__dict__.has_key('variables'):
+            del self.variables
+        header = None
+        name = None
+        for (i,l) in enumerate(self.filelines):
+            if l[0:1] != "#": continue
+            if name is not None and not self.var_index.has_key(name):
+                self.var_index[name] = (header, i)
+            header = i
+            name = l[1:].strip()
+        if name is not None and not self.var_index.has_key(name):
+            self.var_index[name] = (header, len(self.filelines))
+        # store reference and length of filelines to detect outdated index
+        self.index_filelines = self.filelines
+        self.index_length = len(self.filelines)
+        return self.var_index
+
+    def get_var_range(self, var_name):
+        """Determine the line range of a variable in self.filelines
+        
+        The index of variable positions is (re-)built if it does not exist yet or
+        if self.filelines has been replaced or extended directly (e.g. in
+        create_empty_model).
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable, with or without leading "# "
+            
+        **Returns**:
+            Tuple (header, end) with position of header line and end of data lines
+            or None if the variable is not defined in the index
+        """
+        try:
+            if self.index_filelines is not self.filelines or \
+                    self.index_length != len(self.filelines):
+                self.build_index()
+        except AttributeError:
+            self.build_index()
+        return self.var_index.get(var_name.lstrip("#").strip())
+
+    def is_defined(self, var_name):
+        """Check if a variable is defined in the SHEMAT file
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable, with or without leading "# "
+        
+        **Returns**:
+            True if variable is defined, False otherwise
+        """
+        if self.__dict__.has_key('section_index'):
+            return self.section_index.has_key(var_name.lstrip("#").strip())
+        return self.get_var_range(var_name) is not None
+
+    def get_var_lines(self, var_name):
+        """Get the data lines of a variable as stored in the file
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            
+        **Returns**:
+            List of data lines (including newline) or None if not defined
+        """
+        self.flush(var_name)
+        if self.__dict__.has_key('section_index'):
+            pos = self.section_index.get(var_name.lstrip("#").strip())
+            if pos is None:
+                return None
+            return StringIO(self.mmap_data[pos[0]:pos[1]]).readlines()
+        pos = self.get_var_range(var_name)
+        if pos is None:
+            return None
+        return self.filelines[pos[0]+1:pos[1]]
+
+    def get_var_string(self, var_name):
+        """Get the raw data string of a variable as stored in the file
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            
+        **Returns**:
+            String with (joined) data lines of the variable or None if not defined
+        """
+        self.flush(var_name)
+        if self.__dict__.has_key('section_index'):
+            pos = self.section_index.get(var_name.lstrip("#").strip())
+            if pos is None:
+                return None
+            return self.mmap_data[pos[0]:pos[1]]
+        pos = self.get_var_range(var_name)
+        if pos is None:
+            return None
+        return ''.join(self.filelines[pos[0]+1:pos[1]])
+
+    def replace_var_lines(self, var_name, lines):
+        """Replace the data lines of a variable and update the index
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            - *lines* = list of strings : new data lines (including newline)
+        
+        **Returns**:
+            True if variable was replaced, False if it is not defined
+        """
+        pos = self.get_var_range(var_name)
+        if pos is None:
+            return False
+        (header, end) = pos
+        # whitespace lines after the data lines are kept
+        data_end = self.get_data_end(header + 1, end)
+        self.filelines[header+1:data_end] = lines
+        shift = len(lines) - (data_end - header - 1)
+        if shift != 0:
+            # adjust positions of all following variables
+            for (name, (h, e)) in self.var_index.items():
+                if h > header:
+                    self.var_index[name] = (h + shift, e + shift)
+            self.var_index[var_name.lstrip("#").strip()] = (header, end + shift)
+        self.index_length = len(self.filelines)
+        self.update_parsed_var(var_name)
+        return True
+
+    def get_data_end(self, start, end):
+        """Determine the end of the data lines in a section of the SHEMAT file
+        
+        Whitespace-only lines between the data lines of a variable and the next
+        header (e.g. the empty line at the end of a SHEMAT file) are not part of
+        the data and are kept when the variable is replaced.
+        
+        **Arguments**:
+            - *start, end* = int : range of the section in self.filelines, or byte
+            range in the file for lazily opened files (see self.open_lazy)
+        
+        **Returns**:
+            End of the data lines (line or byte position)
+        """
+        if self.__dict__.has_key('section_index'):
+            data = self.mmap_data
+            while end > start:
+                # start of last line in range
+                line_start = max(data.rfind("\n", start, end - 1) + 1, start)
+                if data[line_start:end].strip() != "":
+                    break
+                end = line_start
+        else:
+            while end > start and self.filelines[end-1].strip() == "":
+                end -= 1
+        return end
+
+    def parse_all(self):
+        """Parse all variables of the SHEMAT file in one pass
+        
+        All sections of the SHEMAT file are decoded once and stored in the object
+        variable self.variables as a dictionary {NAME : value}, with
+        - strings for scalar variables (one entry in one line, as returned by self.get)
+        - lists of strings for non-numerical variables with several lines (e.g. SEITET)
+        - numpy arrays for all other numerical variables (e.g. KOPPX_FIELD, TEMP);
+        integer arrays if all values are integers (e.g. GEOLOGY)
+        
+        Values are stored as defined in the file, i.e. including the negative values
+        for Dirichlet boundary conditions in POR, PERM and PRES. After parsing, the
+        access methods (self.get, self.get_array, self.get_bcs, ...) read variables
+        from this dictionary instead of decoding the file lines again, and variables
+        changed with self.set or self.set_array are updated automatically.
+        
+        **Returns**:
+            Dictionary with all variables
+        """
+        self.flush()
+        if self.__dict__.has_key('section_index'):
+            # lazily opened file: parse sections without reading all lines
+            names = self.section_index.keys()
+        else:
+            names = self.build_index().keys()
+        variables = {}
+        for name in names:
+            variables[name] = self.parse_var(name)
+        self.variables = variables
+        return variables
+
+    def get_cache_key(self, filename):
+        """Determine the key of a SHEMAT file for the binary cache file
+        
+        The key consists of the file size, the modification time and a hash of
+        the file content (read from the file in blocks).
+        
+        **Arguments**:
+            - *filename* = string : filename of SHEMAT file
+        
+        **Returns**:
+            Tuple (size, mtime, hash)
+        """
+        stat = os.stat(filename)
+        content_hash = hashlib.md5()
+        file = open(filename, "rb")
+        for block in iter(lambda: file.read(2**24), ''):
+            content_hash.update(block)
+        file.close()
+        return (stat.st_size, stat.st_mtime, content_hash.hexdigest())
+
+    def save_cache(self, filename):
+        """Save all parsed variables in a binary cache file
+        
+        The variables (see self.parse_all) are stored with numpy.savez in the file
+        filename + '.npz', together with the key of the SHEMAT file (see
+        self.get_cache_key). Numerical arrays are stored as values and counts of
+        runs of equal values (similar to the "n*value" format of the SHEMAT
+        file) if this reduces the size, strings and lists of strings are stored
+        as string arrays.
+        
+        **Arguments**:
+            - *filename* = string : filename of SHEMAT file
+        
+        **Returns**:
+            True if the cache file was written, False otherwise
+        """
+        if not self.__dict__.has_key('variables'):
+            self.parse_all()
+        (size, mtime, content_hash) = self.get_cache_key(filename)
+        data = {'_size' : np.array(size), '_mtime' : np.array(mtime),
+                '_hash' : np.array(content_hash)}
+        # byte ranges of sections, to open the file lazily from the cache
+        if self.__dict__.has_key('section_index'):
+            section_index = self.section_index
+        else:
+            file = open(filename, "r")
+            try:
+                section_data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error):
+                section_data = ''
+            file.close()
+            section_index = self.index_sections(section_data)
+            if isinstance(section_data, mmap.mmap):
+                section_data.close()
+        names = sorted(section_index.keys())
+        data['_sections'] = np.array(names)
+        data['_section_ranges'] = np.array([section_index[n] for n in names],
+                                           dtype=np.int64).reshape(-1, 2)
+        for (name, value) in self.variables.items():
+            if isinstance(value, tuple):
+                # not yet expanded (see self.load_cache)
+                data['r_' + name], data['n_' + name] = value
+            elif isinstance(value, np.ndarray):
+                value = value.ravel()
+                ends = np.append(np.flatnonzero(value[1:] != value[:-1]), value.size - 1)
+                if 2 * ends.size < value.size:
+                    data['r_' + name] = value[ends]
+                    data['n_' + name] = np.diff(np.append(-1, ends))
+                else:
+                    data['a_' + name] = value
+            elif isinstance(value, list):
+                data['l_' + name] = np.array(value)
+            elif value is not None:
+                data['s_' + name] = np.array(value)
+        cache_filename = filename + ".npz"
+        try:
+            # write to temporary file first, so that other processes never
+            # read an incomplete cache file
+            f = open(cache_filename + ".tmp", "wb")
+            try:
+                np.savez(f, **data)
+                f.close()
+                if os.path.exists(cache_filename):
+                    shutil.copymode(cache_filename, cache_filename + ".tmp")
+                os.rename(cache_filename + ".tmp", cache_filename)
+            except:
+                # do not leave an incomplete temporary file
+                f.close()
+                os.remove(cache_filename + ".tmp")
+                raise
+        except (IOError, OSError), err:
+            print "Can not write cache file " + cache_filename + ": " + str(err)
+            return False
+        return True
+
+    def load_cache(self, filename):
+        """Load parsed variables from a binary cache file
+        
+        The variables are loaded from the file filename + '.npz' (see self.save_cache)
+        into self.variables, if the key of the cache file (size, modification time
+        and content hash, see self.get_cache_key) agrees with the SHEMAT file.
+        Arrays stored as runs of equal values are kept as tuples (values, counts)
+        and only expanded when they are accessed (see self.get_parsed_var).
+        
+        The size and modification time are checked before the SHEMAT file is
+        read (for the hash). If the lines of the SHEMAT file have not been read
+        yet, the file is opened lazily with the section positions stored in the
+        cache file (see self.open_lazy).
+        
+        **Arguments**:
+            - *filename* = string : filename of SHEMAT file
+        
+        **Returns**:
+            True if the variables were loaded, False if the cache file does not exist
+            or is outdated
+        """
+        cache_filename = filename + ".npz"
+        if not os.path.exists(cache_filename):
+            return False
+        variables = None
+        try:
+            data = np.load(cache_filename)
+            stat = os.stat(filename)
+            # first check size and time, then (more expensive) hash of content
+            if int(data['_size']) == stat.st_size and float(data['_mtime']) == stat.st_mtime \
+                    and '_sections' in data.files \
+                    and str(data['_hash']) == self.get_cache_key(filename)[2]:
+                section_index = dict(zip(data['_sections'].tolist(),
+                                         [tuple(r) for r in data['_section_ranges'].tolist()]))
+                variables = {}
+                for key in data.files:
+                    if key[:2] == 'a_':
+                        variables[key[2:]] = data[key]
+                    elif key[:2] == 'r_':
+                        variables[key[2:]] = (data[key], data['n_' + key[2:]])
+                    elif key[:2] == 'l_':
+                        variables[key[2:]] = data[key].tolist()
+                    elif key[:2] == 's_':
+                        variables[key[2:]] = str(data[key])
+            data.close()
+        except (IOError, OSError, KeyError, ValueError), err:
+            print "Can not read cache file " + cache_filename + ": " + str(err)
+            return False
+        if variables is None:
+            print "Cache file " + cache_filename + " is outdated"
+            return False
+        if self.__dict__.has_key('filelines'):
+            self.build_index()
+        else:
+            self.open_lazy(filename, section_index)
+        self.variables = variables
+        return True
+
+    def parse_var(self, var_name):
+        """Parse one variable from the file lines into a string, list or numpy array
+        
+        See self.parse_all for the conventions of the returned types.
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            
+        **Returns**:
+            String, list of strings or numpy array with variable value
+            or None if the variable is not defined
+        """
+        lines = self.get_var_lines(var_name)
+        if lines is None:
+            return None
+        lines = [l for l in lines if l.strip() != '']
+        if len(lines) == 0:
+            return ''
+        entry = lines[0].strip()
+        if len(lines) == 1 and not (" " in entry or "," in entry or "*" in entry):
+            # scalar variable
+            return lines[0]
+        data_raw = ''.join(lines)
+        if re.search(r"[^0-9eE+\-.*,\s]", data_raw):
+            # non-numerical variable, e.g. TITLE or SEITET
+            if len(lines) == 1:
+                return lines[0]
+            return lines
+        data = self.decode_array_string(data_raw, var_name)
+        if not re.search(r"[.eE]", data_raw):
+            data = data.astype(int)
+        return data
+
+    def get_parsed_var(self, var_name):
+        """Get a variable from self.variables, if variables are parsed
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            
+        **Returns**:
+            Parsed value (see self.parse_all) or None if not parsed
+        """
+        self.flush(var_name)
+        if not self.__dict__.has_key('variables'):
+            return None
+        try:
+            if not self.__dict__.has_key('section_index'):
+                # parsed variables are discarded if the file lines were replaced
+                self.get_var_range(var_name)
+            name = var_name.lstrip("#").strip()
+            value = self.variables.get(name)
+        except AttributeError:
+            return None
+        if isinstance(value, tuple):
+            # array loaded from cache file as runs of equal values
+            value = np.repeat(value[0], value[1])
+            self.variables[name] = value
+        return value
+
+    def update_parsed_var(self, var_name):
+        """Update a variable in self.variables after changing the file lines
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+        """
+        if self.__dict__.has_key('variables'):
+            self.variables[var_name.lstrip("#").strip()] = self.parse_var(var_name)
+
+    def mark_modified_arrays(self, names=None):
+        """Mark cached arrays as changed if they have been modified in place
+        
+        Arrays returned by self.get_np_array (and self.get_slice) are views of the
+        cached arrays and can be changed directly. These arrays are marked as
+        possibly changed when they are returned, and only they are checked here:
+        a change is detected with a checksum (zlib.crc32) of the array values,
+        so that unchanged arrays are not encoded (and rounded to the output
+        format) again. Each check reads the whole array; arrays that are only
+        read should therefore be requested with self.get_array (a copy).
+        
+        ..Note: a change that does not alter the checksum is not detected (the
+        probability is 2**-32 for random changes); use self.set_array to make sure
+        that an array is written.
+        
+        **Optional keywords**:
+            - *names* = list of strings : names of variables to check (default: all
+            arrays returned as views)
+        """
+        if names is None:
+            names = self.array_checksums.keys()
+        for name in names:
+            if self.dirty_vars.has_key(name) or not self.array_checksums.has_key(name):
+                continue
+            if zlib.crc32(self.array_cache[name]) != self.array_checksums[name]:
+                self.dirty_vars[name] = (name, {})
+                self.reset_geometry(name)
+
+    def flush(self, var_name=None):
+        """Write changed arrays from the array cache to the file lines
+        
+        Arrays set with self.set_array (or modified in place, see self.get_np_array)
+        are only stored in the array cache and converted to the compressed
+        SHEMAT format when the file lines are required, i.e. when the variable
+        is read as text or the file is written (self.write_file). Only changed
+        variables are encoded again.
+        
+        **Optional keywords**:
+            - *var_name* = string : Name of SHEMAT variable (default: all changed arrays)
+        """
+        if var_name is None:
+            self.mark_modified_arrays()
+            names = self.dirty_vars.keys()
+        else:
+            name = var_name.lstrip("#").strip()
+            if not self.array_cache.has_key(name):
+                return
+            self.mark_modified_arrays([name])
+            if not self.dirty_vars.has_key(name):
+                return
+            names = [name]
+        for name in names:
+            (set_name, kwds) = self.dirty_vars.pop(name)
+            data = self.array_cache[name]
+            # checksum has to be updated before the lines are replaced (and parsed)
+            if self.array_checksums.has_key(name):
+                self.array_checksums[name] = zlib.crc32(data)
+            value = self.encode_array(set_name, data, **kwds)
+            self.replace_var_lines(set_name, [value + "\n"])
         
     def write_file(self, filename):
         """Write SHEMAT object to file
         
+        Changed arrays are encoded into the file lines (see self.flush), which are
+        then written. If the file has been opened lazily (see self.open_lazy),
+        unchanged variables are copied from the original file and changed arrays
+        are written directly from the array cache in blocks (see self.write_array),
+        so that no string with all values of an array is created; the object
+        then reads its variables from the written file.
+        
+        The file is first written to a temporary file (filename + '.tmp') in the
+        same directory, which then replaces the target file. The target file can
+        therefore be the file the object was read from, also if it has been opened
+        lazily and unchanged parts are copied from the mapped file; the mapping
+        is never truncated and remains valid after the file has been replaced.
+        The permissions of a replaced file are kept, and the temporary file is
+        removed if writing fails.
+        
        **Arguments**:
             - *filename* = string: filename of SHEMAT file (extension .nml is
             automatically assigned if not given)
@@ -99,14 +958,73 @@ class Shemat_file:
             # print "Add extesion .nml to filename " + filename
             filename += ".nml"
         try:
-            file = open(filename,"w")
+            file = open(filename + ".tmp","w")
         except IOError, (nr, string_err):
             print "Can not open file" + filename + ": " + string_err + " Err#" + str(nr)
             print "Please check file name and directory and try again"
             exit(0)        
         print "Write new SHEMAT file: " + filename
-        file.writelines(self.filelines)
-        file.close()
+        lazy = self.__dict__.has_key('section_index')
+        try:
+            if not lazy:
+                self.flush()
+                file.writelines(self.filelines)
+            else:
+                # determine byte ranges of changed arrays
+                self.mark_modified_arrays()
+                sections = []
+                for name in self.dirty_vars.keys():
+                    (start, end) = self.section_index[name]
+                    sections.append((start, self.get_data_end(start, end), name))
+                sections.sort()
+                size = len(self.mmap_data)
+                sections.append((size, size, None))
+                pos = 0
+                for (start, end, name) in sections:
+                    # copy unchanged part of the file
+                    for i in range(pos, start, 2**24):
+                        file.write(self.mmap_data[i:min(i + 2**24, start)])
+                    if name is not None:
+                        (set_name, kwds) = self.dirty_vars[name]
+                        self.write_array(file, set_name, self.array_cache[name], **kwds)
+                        file.write("\n")
+                    pos = end
+            file.close()
+            if os.path.exists(filename):
+                # keep the permissions of the replaced file
+                shutil.copymode(filename, filename + ".tmp")
+        except:
+            # do not leave an incomplete temporary file
+            file.close()
+            os.remove(filename + ".tmp")
+            raise
+        try:
+            os.rename(filename + ".tmp", filename)
+        except OSError:
+            # existing files can not be replaced by renaming (Windows), and a
+            # mapped file can not be removed: read the source file completely
+            # and close the mapping before the target file is removed
+            if lazy and os.path.abspath(filename) == os.path.abspath(self.filename):
+                self.load_filelines()
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(filename + ".tmp", filename)
+        if lazy:
+            # the written file contains all changes: map it instead of the
+            # original file, so that the changed arrays are not written again
+            written = self.dirty_vars.keys()
+            if isinstance(self.__dict__.get('mmap_data'), mmap.mmap):
+                self.mmap_data.close()
+            for key in ('filelines', 'index_filelines', 'index_length', 'var_index'):
+                if self.__dict__.has_key(key):
+                    del self.__dict__[key]
+            self.open_lazy(filename)
+            self.filename = filename
+            self.dirty_vars = {}
+            for name in written:
+                if self.array_checksums.has_key(name):
+                    self.array_checksums[name] = zlib.crc32(self.array_cache[name])
+                self.update_parsed_var(name)
         
     def adjust_ctl_file(self, old_filename, new_filename, **kwds):
         """Adjust an existing SHEMAT control file with a new filename
@@ -234,6 +1152,29 @@ class Shemat_file:
         **Returns**:
             String with variable    
         """
+        value = self.get_parsed_var(var_name)
+        if isinstance(value, str) and line == 1:
+            return value
+        elif isinstance(value, list):
+            if line == 1:
+                return value[0]
+            else:
+                return value[:line]
+        if self.__dict__.has_key('section_index'):
+            # lazily opened file: read only the lines of this variable
+            lines = self.get_var_lines(var_name)
+            if lines is not None and len(lines) >= line:
+                if line == 1:
+                    return lines[0]
+                else:
+                    return lines[:line]
+        pos = self.get_var_range(var_name)
+        if pos is not None:
+            if line == 1:
+                return self.filelines[pos[0]+1]
+            else:
+                return self.filelines[pos[0]+1:pos[0]+1+line]
+        # variable not in index: search for partial name
         for (i,l) in enumerate(self.filelines):
             if var_name in l:
                 if line == 1:
@@ -252,62 +1193,21 @@ class Shemat_file:
         
         Array variables (e.g. temperature, pressure, etc.) in SHEMAT are stored
         in 1-D arrays in a compressed format. With this method, the variables
-        are decompressed and returned as a 1-D list. The method also adjusts
-        special boundary condition settings which are partly implemented as
-        negative values of pressure, porosity and permeability.
+        are decompressed (see self.decode_array_string) and returned as a 1-D
+        numpy array. The method also adjusts special boundary condition settings
+        which are partly implemented as negative values of pressure, porosity
+        and permeability.
 
         **Arguments**:
             - *var_name* = string : Name of scalar variable
             
         **Returns**:
-            - 1-D list with values
+            - 1-D numpy array (float64) with values
         """
-        for (i,l) in enumerate(self.filelines):
-            # Include: explicit definition of var_name to prevent double-matching
-            if var_name[0] == "#":
-                if not var_name in l: continue
-            elif not "# " + var_name in l: continue
-            if True: 
-                # problem with .nlo files: strangely other value separators
-                # (csv) and unfortunately also some extra newlines...
-                # thus: read data until next # separator (can this cause problems?)
-                j = 1
-                data_raw = ''
-                if 'AREAKT' in var_name: data_raw = data_raw + self.filelines[i+j]
-                else:
-                    while "#" not in self.filelines[i+j]:
-                        data_raw = data_raw + self.filelines[i+j]
-                        # print "used %d" % j
-                        j += 1
-                # data_raw = self.filelines[i+1]
-                # if "#" not in self.filelines[i+2]: data_raw = data_raw + self.filelines[i+2]
-                data_raw = re.split(', *| *', data_raw)
-                data = []
-                # print "length of data for " + var_name +  " %d" % len(data_raw)
-                if len(data_raw) == 1: # new_line at end of string!
-                    if data_raw[0][-1] == '\n':
-                        data_raw[0] = data_raw[0][0:-1] # last "entry" is newline command!
-                    else:
-                        data_raw[0] = data_raw[0][0:-2]
-                else:
-                    if data_raw[-1] == '\n':
-                        data_raw = data_raw[0:-1] # last "entry" is newline command!
-                for d in data_raw: 
-                    # if multiple definition with "*": split
-                    if "*" in d:
-                        d1 = d.split("*")
-                        for i in range(int(d1[0])):
-                            data.append(float(d1[1]))
-                    else:
-                        if d == '' or d == ' ' or d == '\n': continue # last value is an empty string
-                        try:
-                            data.append(float(d))
-                        except ValueError:
-                            print "Possibly a problem with a value, probably empty string: " + d
-                            print "While reading %s " % var_name
-                            print "If all values are correct, this error could be due to an incorrect"
-                            print "line ending, for example when opening a file created on a windows machine"
-                            print "with PySHEMAT on Linux or Mac"
+        data = self.get_var_values(var_name)
+        if data is None:
+            print "Variable " + var_name + " not defined in Shemat file!"
+            return None
         # check, if Boundary Conditions are affected
         if var_name == "POR" or var_name == "PERM" or var_name == "PRES":
             # check, if bcs are already read:
@@ -316,16 +1216,126 @@ class Shemat_file:
             except AttributeError:                
                 self.get_bcs()
             # now: check data itself and return as positive value!
-            for i,d in enumerate(data):
-                if d < 0:
-                    data[i] = -d
-        try:
-            data
-        except UnboundLocalError:
-            print "Variable " + var_name + " not defined in Shemat file!"
-            return None
+            data = np.abs(data)
         return data
     
+    def get_var_values(self, var_name):
+        """Get the values of a variable as defined in the file
+        
+        Values are taken from the array cache, the parsed variables (see 
+        self.parse_all), if available, or decoded from the file lines. Decoded
+        arrays are stored in the array cache, so that every variable is only
+        decoded once. In contrast to self.get_array, negative values of boundary
+        conditions are not adjusted.
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            
+        **Returns**:
+            - 1-D numpy array (float64) with values or None if not defined
+        """
+        name = var_name.lstrip("#").strip()
+        if self.array_cache.has_key(name):
+            return self.array_cache[name].copy()
+        value = self.get_parsed_var(var_name)
+        if isinstance(value, np.ndarray):
+            data = np.array(value, dtype=np.float64)
+            self.array_cache[name] = data
+            return data.copy()
+        elif isinstance(value, list):
+            data_raw = ''.join(value)
+        elif isinstance(value, str):
+            data_raw = value
+        else:
+            # problem with .nlo files: strangely other value separators
+            # (csv) and unfortunately also some extra newlines...
+            # thus: read data until next # separator (determined in index)
+            data_raw = self.get_var_string(var_name)
+            if data_raw is None:
+                return None
+        data = self.decode_array_string(data_raw, var_name)
+        if self.is_defined(var_name):
+            self.array_cache[name] = data
+            return data.copy()
+        return data
+    
+    def decode_array_string(self, data_raw, var_name=''):
+        """Decode the compressed string of a SHEMAT array variable
+        
+        Values in SHEMAT files are separated by blanks, commas or newlines, and
+        repeated values are compressed as "n*value". The whole string is split 
+        into tokens at once and all values are converted in one step; repeated
+        values are then expanded with numpy.repeat.
+        
+        **Arguments**:
+            - *data_raw* = string : data lines of the variable
+            
+        **Optional Arguments**:
+            - *var_name* = string : name of variable (for error messages only)
+        
+        **Returns**:
+            - 1-D numpy array (float64) with decompressed values
+        """
+        data_raw = data_raw.replace(",", " ")
+        tokens = data_raw.split()
+        if re.search(r"[^0-9eE+\-.*\s]", data_raw):
+            # at least one entry is not a number: convert value by value
+            return self.decode_array_tokens(tokens, var_name)
+        if "*" in data_raw:
+            is_run = np.array(["*" in t for t in tokens], dtype=bool)
+            data_raw = data_raw.replace("*", " ")
+        else:
+            is_run = None
+        import warnings
+        with warnings.catch_warnings():
+            # numpy warns if the string can not be read to its end; this case
+            # is detected below from the number of values
+            warnings.simplefilter("ignore")
+            values = np.fromstring(data_raw, dtype=np.float64, sep=" ")
+        n_values = len(tokens)
+        if is_run is not None:
+            n_values += np.count_nonzero(is_run)
+        if values.size != n_values:
+            # at least one entry is not a number: convert value by value
+            return self.decode_array_tokens(tokens, var_name)
+        if is_run is None:
+            return values
+        # position of the (last) value of each token in the values array
+        pos = np.cumsum(is_run + 1) - 1
+        counts = np.where(is_run, values[pos - is_run], 1).astype(int)
+        return np.repeat(values[pos], counts)
+    
+    def decode_array_tokens(self, tokens, var_name=''):
+        """Decode a list of SHEMAT array tokens value by value
+        
+        Used by self.decode_array_string if not all tokens can be converted to
+        numbers. Tokens which are not a number are skipped with a warning.
+        
+        **Arguments**:
+            - *tokens* = list of strings : single entries of the array variable
+            
+        **Optional Arguments**:
+            - *var_name* = string : name of variable (for error messages only)
+        
+        **Returns**:
+            - 1-D numpy array (float64) with decompressed values
+        """
+        data = []
+        for d in tokens: 
+            # if multiple definition with "*": split
+            if "*" in d:
+                d1 = d.split("*")
+                data.extend(int(d1[0]) * [float(d1[1])])
+            else:
+                try:
+                    data.append(float(d))
+                except ValueError:
+                    print "Possibly a problem with a value, probably empty string: " + d
+                    print "While reading %s " % var_name
+                    print "If all values are correct, this error could be due to an incorrect"
+                    print "line ending, for example when opening a file created on a windows machine"
+                    print "with PySHEMAT on Linux or Mac"
+        return np.array(data, dtype=np.float64)
     
     def get_bcs(self):
         """Determine the boundary conditions and return as 1-D list
@@ -336,7 +1346,10 @@ class Shemat_file:
         - head: neagitve PERM values
         
         With this method, boundary conditions are evaluated and stored in
-        object variables self.diri_temp, self.diri_conc, and self.diri_head"""
+        object variables self.diri_temp, self.diri_conc, and self.diri_head as
+        1-D numpy bool arrays (sign bit of the values). The values are taken from
+        the array cache, i.e. the variables are only decoded once for the boundary
+        conditions and self.get_array (see self.get_var_values)."""
         # initialize object variables
         print "get BCs and store in object variables"
         self.diri_conc = []
@@ -349,48 +1362,15 @@ class Shemat_file:
                 print "read concentration boundary conditions"
             elif var_name == "PERM":
                 print "read hydraulic head boundary conditions"           
-            for (i,l) in enumerate(self.filelines):
-                if var_name in l:
-                    # problem with .nlo files: strangely other value separators
-                    # (csv) and unfortunately also some extra newlines...
-                    # thus: read data until next # separator (can this cause problems?)
-                    j = 1
-                    data_raw = ''
-                    while "#" not in self.filelines[i+j]:
-                        data_raw = data_raw + self.filelines[i+j]
-                        # print "used %d" % j
-                        j += 1
-                    # data_raw = self.filelines[i+1]
-                    # if "#" not in self.filelines[i+2]: data_raw = data_raw + self.filelines[i+2]
-                    data_raw = re.split(', *| *', data_raw)
-                    for d in data_raw[0:-1]: # last "entry" is newline command!
-                        # if multiple definition with "*": split
-                        if "*" in d:
-                            d = d.split("*")
-                            for i in range(int(d[0])):
-                                if d == '' : continue
-                                # now, if value is negative: BC!
-                                if float(d[1]) < 0: tmp = True
-                                else: tmp = False
-                                if var_name == "POR":
-                                    self.diri_temp.append(tmp)
-                                elif var_name == "PRES":
-                                    self.diri_conc.append(tmp)
-                                elif var_name == "PERM":
-                                    self.diri_head.append(tmp)
-                        else:
-                            if d == '' : continue
-                            try:
-                                if float(d) < 0: tmp = True
-                            except ValueError:
-                                continue
-                            else: tmp = False
-                            if var_name == "POR":
-                                self.diri_temp.append(tmp)
-                            elif var_name == "PRES":
-                                self.diri_conc.append(tmp)
-                            elif var_name == "PERM":
-                                self.diri_head.append(tmp)
+            data = self.get_var_values(var_name)
+            if data is None: continue
+            # now, if value is negative: BC!
+            if var_name == "POR":
+                self.diri_temp = np.signbit(data)
+            elif var_name == "PRES":
+                self.diri_conc = np.signbit(data)
+            elif var_name == "PERM":
+                self.diri_head = np.signbit(data)
         return True
     
     def update_bcs(self):
@@ -420,6 +1400,17 @@ class Shemat_file:
         **Arguments**:
             - *var_name* = string : name of the SHEMAT variable
             - *value* = string or number : variable value"""
+        self.flush(var_name)
+        pos = self.get_var_range(var_name)
+        if pos is not None:
+            self.filelines[pos[0]+line] = str(value) + "\n"
+            self.update_parsed_var(var_name)
+            name = var_name.lstrip("#").strip()
+            if self.array_cache.has_key(name):
+                del self.array_cache[name]
+                self.array_checksums.pop(name, None)
+            self.reset_geometry(var_name)
+            return
         for (i,l) in enumerate(self.filelines):
             if var_name in l:
                 self.filelines[i+line] = str(value) + "\n"
@@ -436,14 +1427,19 @@ class Shemat_file:
         these object variables/ local variables are automatically
         set if PERM, POR or PRES are set
         
+        The values are stored in the array cache and only converted to the
+        compressed format when the file lines are required (see self.flush).
+        
         **Arguments**:
             - *var_name* = string : Name of SHEMAT variable
             - *value_list* = 1-D list of strings or numbers : Values
         
         **Optional keywords**:
-            - float_type = 'high_res', 'normal' : precision of floating point; normal: 2 digits only                 
+            - float_type = 'high_res', 'normal', 'lossless' or int : precision of floating point;
+            normal: 2 digits only, lossless: shortest representation that is read back
+            exactly, int: number of significant digits (default: see self.set_float_format)
         """
-        value = ""
+        value_list = np.array(value_list, dtype=np.float64).ravel()
         # check, if Boundary Conditions are affected
         if var_name == "POR" or var_name == "PERM" or var_name == "PRES":
             # check, if bcs are already read:
@@ -451,75 +1447,177 @@ class Shemat_file:
                 self.diri_temp
             except AttributeError:                
                 self.get_bcs()
-            # now: set negative values, if BCs are defined at list positions
+            # now: set negative values, if BCs are defined at array positions
             if var_name == "POR":
-                for i,l in enumerate(value_list):
-                    if self.diri_temp[i]:
-                        value_list[i] = -l
-            if var_name == "PERM":
-                for i,l in enumerate(value_list):
-                    if self.diri_head[i] == True:
-                        value_list[i] = -l
-            if var_name == "PRES":
-                for i,l in enumerate(value_list):
-                    if self.diri_conc[i] == True:
-                        value_list[i] = -l                
-        # search variable position in .nml file
+                mask = self.diri_temp
+            elif var_name == "PERM":
+                mask = self.diri_head
+            else:
+                mask = self.diri_conc
+            value_list = np.where(np.asarray(mask, dtype=bool), -value_list, value_list)
+        if self.is_defined(var_name):
+            # store in array cache and mark as changed
+            name = var_name.lstrip("#").strip()
+            self.array_cache[name] = value_list
+            self.array_checksums.pop(name, None)
+            self.dirty_vars[name] = (var_name, kwds)
+            self.reset_geometry(var_name)
+            return
+        # variable not in index: search for partial name
+        # construct variable in correct format with multiplier "*"
+        value = self.encode_array(var_name, value_list, **kwds)
         for (i,l) in enumerate(self.filelines):
             if var_name in l:
-                # construct variable in correct format with multiplier "*"
-                n = 1
-                for (j,val) in enumerate(value_list):
-                    try:
-                        if val == value_list[j+1]:
-                            n += 1
-                            continue
-                    except IndexError: pass
-                    if n == 1:
-                        if var_name == "PERM" or var_name == "HPR":
-                            # check if value == 0, then: assign 0 only
-                            if val == 0:
-                                value += "0 "
-                            else:
-                                value += "%.2e " % val
-                        elif var_name == "GEOLOGY": # or var_name == "ANISOJ" or var_name == "ANISOI":
-                            # integer value
-                            value += "%d " % val
-                        elif var_name == "QBASAL3D" or var_name == "# QBASAL3D":
-                            # assign four digits
-                            value += "%.4e " % val
-                        elif kwds.has_key('float_type'):
-                            if kwds['float_type'] == 'high_res':
-                                value += "%.2e " % val
-                        else:
-                            value += "%.2f " % val
-                    else:
-                        if var_name == "PERM" or var_name == "HPR":
-                            # check if value == 0, then: assign 0 only
-                            if val == 0:
-                                value += "%d*0 " % n
-                            else:
-                                value += "%d*%.2e " % (n,val)
-                        elif var_name == "GEOLOGY": # or var_name == "ANISOJ" or var_name == "ANISOI":
-                            # integer value
-                            value += "%d*%d " % (n,val)
-                        elif var_name == "QBASAL3D":
-                            # assign three digits
-                            value += "%d*%.3e " % (n,val)
-                        elif kwds.has_key('float_type'):
-                            if kwds['float_type'] == 'high_res':
-                                value += "%d*%e " % (n, val)
-                        else:
-                            value += "%d*%.2f " % (n, val)
-                        n = 1
-                # set in .nml file
                 self.filelines[i+1] = value + "\n"
     
+    def encode_array(self, var_name, value_list, **kwds):
+        """Encode values of an array variable in the compressed SHEMAT format
+        
+        Repeated values are compressed with multipliers "n*value" (as used in 
+        SHEMAT .nml files), see self.write_array and self.encode_runs.
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            - *value_list* = 1-D list or array of numbers : Values
+        
+        **Optional keywords**:
+            - float_type = 'high_res', 'normal', 'lossless' or int : precision of floating point;
+            normal: 2 digits only, lossless: shortest representation that is read back
+            exactly, int: number of significant digits (default: see self.set_float_format)
+
+        **Returns**:
+            String with compressed values (without newline)
+        """
+        out = StringIO()
+        self.write_array(out, var_name, value_list, **kwds)
+        return out.getvalue()
+
+    def write_array(self, file, var_name, value_list, chunk_size=65536, **kwds):
+        """Write values of an array variable in the compressed SHEMAT format
+        
+        The values are processed in blocks of chunk_size values: runs of equal
+        values are determined with numpy (a run can continue in the next block)
+        and each block is encoded (see self.encode_runs) and written to the file
+        directly. The memory required is therefore independent of the
+        array size.
+        
+        **Arguments**:
+            - *file* = file object (or any object with a write method)
+            - *var_name* = string : Name of SHEMAT variable
+            - *value_list* = 1-D list or array of numbers : Values
+        
+        **Optional keywords**:
+            - *chunk_size* = int : number of values encoded in one block
+            - float_type = 'high_res', 'normal', 'lossless' or int : precision of floating point;
+            normal: 2 digits only, lossless: shortest representation that is read back
+            exactly, int: number of significant digits (default: see self.set_float_format)
+        """
+        values = np.asarray(value_list, dtype=np.float64).ravel()
+        carry = 0
+        for start in range(0, values.size, chunk_size):
+            block = values[start:start+chunk_size]
+            # determine runs of equal values; value of a run is its last entry
+            ends = np.append(np.flatnonzero(block[1:] != block[:-1]), block.size - 1)
+            counts = np.diff(np.append(-1, ends))
+            counts[0] += carry
+            carry = 0
+            if start + chunk_size < values.size and values[start+chunk_size] == block[-1]:
+                # last run continues in next block
+                carry = counts[-1]
+                ends = ends[:-1]
+                counts = counts[:-1]
+            if ends.size > 0:
+                file.write(self.encode_runs(var_name, counts, block[ends], **kwds))
+
+    def encode_runs(self, var_name, counts, run_values, **kwds):
+        """Encode runs of equal values in the compressed SHEMAT format
+        
+        All runs are formatted with one string formatting operation.
+        Values are formatted according to the variable:
+        - GEOLOGY: integer
+        - float_type 'lossless': shortest representation that is read back exactly
+        - float_type int n: n significant digits ("%.ng")
+        - PERM, HPR: "%.2e" (0 is written as 0)
+        - QBASAL3D: "%.4e" (single values) and "%.3e" (repeated values)
+        - all others: "%.2f" or "%.2e"/"%e" for float_type 'high_res'
+        The float_type is taken from the keyword or, if not given, from the format
+        defined for the variable with self.set_float_format.
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+            - *counts* = 1-D array of int : number of values in each run
+            - *run_values* = 1-D array of float : value of each run
+        
+        **Optional keywords**:
+            - float_type = 'high_res', 'normal', 'lossless' or int : precision of floating point;
+            normal: 2 digits only, lossless: shortest representation that is read back
+            exactly, int: number of significant digits (default: see self.set_float_format)
+
+        **Returns**:
+            String with compressed values
+        """
+        name = var_name.lstrip("#").strip()
+        float_type = kwds.get('float_type', self.float_formats.get(name, 'normal'))
+        zero_format = None
+        if name == "GEOLOGY": # or var_name == "ANISOJ" or var_name == "ANISOI":
+            # integer value
+            single_format, run_format = "%d ", "%d*%d "
+        elif float_type == 'lossless':
+            # repr of a float is the shortest string that is read back exactly
+            single_format, run_format = "%r ", "%d*%r "
+        elif isinstance(float_type, int):
+            single_format = "%%.%dg " % float_type
+            run_format = "%d*" + single_format
+        elif name == "PERM" or name == "HPR":
+            single_format, run_format = "%.2e ", "%d*%.2e "
+            # check if value == 0, then: assign 0 only
+            zero_format = "0 "
+        elif name == "QBASAL3D":
+            # assign four digits (three for repeated values)
+            single_format, run_format = "%.4e ", "%d*%.3e "
+        elif float_type == 'high_res':
+            single_format, run_format = "%.2e ", "%d*%e "
+        else:
+            single_format, run_format = "%.2f ", "%d*%.2f "
+        # every run is formatted from a pair (count, value); for single
+        # values, the count is consumed by an empty "%.0s" field
+        formats = ["%.0s" + single_format, run_format]
+        kind = (counts > 1).astype(int)
+        if zero_format is not None:
+            formats += ["%.0s%.0s" + zero_format, "%d*%.0s" + zero_format]
+            kind += 2 * (run_values == 0)
+        fmt = ''.join(np.array(formats)[kind].tolist())
+        args = [None] * (2 * len(counts))
+        args[0::2] = counts.tolist()
+        args[1::2] = run_values.tolist()
+        return fmt % tuple(args)
+    
+    def set_float_format(self, var_name, float_type='normal'):
+        """Set the output format of a variable
+        
+        The format is used whenever the variable is written (self.set_array,
+        self.write_file), if no float_type is passed explicitly. Integer variables
+        (GEOLOGY) are always written as integers.
+        
+        **Arguments**:
+            - *var_name* = string : Name of SHEMAT variable
+        
+        **Optional keywords**:
+            - *float_type* = 'normal', 'high_res', 'lossless' or int : precision of
+            floating point (see self.encode_runs); 'normal' is the original format
+        """
+        if not (float_type in ('normal', 'high_res', 'lossless') or \
+                (isinstance(float_type, int) and float_type > 0)):
+            raise ValueError("float_type must be 'normal', 'high_res', 'lossless' " +
+                             "or a positive number of significant digits")
+        self.float_formats[var_name.lstrip("#").strip()] = float_type
+
     def set_array_from_xyz_structure(self,var_name, xyz_structure_list,**kwds):
         """Set a SHEMAT variable from a 3-D list of values
         
         Set variable 'var_name' with values in 'xyz_structure_list' in .nml_file;
         xyz_structure_list can be one of those derived from get_array_as_xyz_structure
+        (3-D array[x,y,z] or nested lists with data[i][j][k])
         mulitpliers "*" are constructed (as used in Shemat .nml file)
         The SHEMAT boundary condition definitions are considered:
         - self.diri_conc: Dirichlet BC for concentration => PRES neg
@@ -533,70 +1631,14 @@ class Shemat_file:
             - *value_list* = 1-D list of strings or numbers : Values
         
         **Optional keywords**:
-            - float_type = 'high_res', 'normal' : precision of floating point; normal: 2 digits only                 
+            - float_type = 'high_res', 'normal', 'lossless' or int : precision of floating point;
+            normal: 2 digits only, lossless: shortest representation that is read back
+            exactly, int: number of significant digits (default: see self.set_float_format)
         """
-        value = ""
-        # decompose xyz-list into norma value list
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        value_list = []
-        for k in range(kdim):
-            for j in range(jdim):
-                for i in range(idim):
-                    value_list.append(xyz_structure_list[i][j][k])
-        
-
-        # check, if Boundary Conditions are affected
-        if var_name == "POR" or var_name == "PERM" or var_name == "PRES":
-            # check, if bcs are already read:
-            try:
-                self.diri_temp
-            except AttributeError:                
-                self.get_bcs()
-            # now: set negative values, if BCs are defined at list positions
-            if var_name == "POR":
-                for i,l in enumerate(value_list):
-                    if self.diri_temp[i]:
-                        value_list[i] = -l
-            if var_name == "PERM":
-                for i,l in enumerate(value_list):
-                    if self.diri_head[i] == True:
-                        value_list[i] = -l
-            if var_name == "PRES":
-                for i,l in enumerate(value_list):
-                    if self.diri_conc[i] == True:
-                        value_list[i] = -l   
-        # search variable position in .nml file
-        for (i,l) in enumerate(self.filelines):
-            if var_name in l:
-                # construct variable in correct format with multiplier "*"
-                n = 1
-                for (j,val) in enumerate(value_list):
-                    try:
-                        if val == value_list[j+1]:
-                            n += 1
-                            continue
-                    except IndexError: pass
-                    if n == 1:
-                        if var_name == "PERM" or var_name == "HPR":
-                            value += "%.2e " % val
-                        elif kwds.has_key('float_type'):
-                            if kwds['float_type'] == 'high_res':
-                                value += "%.2e " % val
-                        else:
-                            value += "%.2f " % val
-                    else:
-                        if var_name == "PERM" or var_name == "HPR":
-                            value += "%d*%.2e " % (n,val)
-                        elif kwds.has_key('float_type'):
-                            if kwds['float_type'] == 'high_res':
-                                value += "%d*%e " % (n, val)
-                        else:
-                            value += "%d*%.2f " % (n, val)
-                        n = 1
-                # set in .nml file
-                self.filelines[i+1] = value + "\n"
+        # decompose xyz-structure (array[x,y,z]) into SHEMAT array order
+        value_list = np.asarray(xyz_structure_list).transpose(2, 1, 0).ravel()
+        # set array with (flattened) value list
+        self.set_array(var_name, value_list, **kwds)
     
     def create_formations_ids(self):
         """create array self.formation_ids with formation ids from geology data array"""
@@ -614,33 +1656,9 @@ class Shemat_file:
             - *array* = list or array to be restructured
         
         **Returns**:
-            Restructured 3-D list of data values
+            Restructured 3-D array of data values (transposed view of array[x,y,z])
         """
-        from numpy import size
-        if not (self.idim*self.jdim*self.kdim == size(array)):
-            print "new dimensions not consistent with array size"
-            print "can not create new array!"
-            return
-        
-        # initialize output array
-        data = []
-        # iterate over dimensions and re-sort array
-        n = 0
-        # initialize array in x,y,z-order
-        for i in range(self.idim):
-            tmp2 = []
-            for j in range(self.jdim):
-                tmp = [0 for k in range(self.kdim)]
-                tmp2.append(tmp)
-            data.append(tmp2)
-        
-        # now, fill data structure in z,y,x loops for correct x,y,z order
-        for k in range(self.kdim):
-            for j in range(self.jdim):
-                for i in range(self.idim):
-                    data[i][j][k] = array[n]
-                    n += 1
-        return data
+        return self.array_to_xyz_structure(array, self.idim, self.jdim, self.kdim)
     
     def array_to_xyz_structure(self,array,idim,jdim,kdim):
         """restructure array into x,y,z 3-D structure as data[i][j][k]
@@ -654,34 +1672,16 @@ class Shemat_file:
             - *kdim* = int : dimension of new array in z-direction
 
         **Returns**:
-            Restructured 3-D list of data values
+            Restructured 3-D array of data values (array[x,y,z]); for a numpy array,
+            the result is a transposed view of the original array (no copy)
         """
         # check if array length and new dimensions are consistent
-        from numpy import size
-        if not (idim*jdim*kdim == size(array)):
+        if not (idim*jdim*kdim == np.size(array)):
             print "new dimensions not consistent with array size"
             print "can not create new array!"
             return
-        
-        # initialize output array
-        data = []
-        # iterate over dimensions and re-sort array
-        n = 0
-        # initialize array in x,y,z-order
-        for i in range(idim):
-            tmp2 = []
-            for j in range(jdim):
-                tmp = [0 for k in range(kdim)]
-                tmp2.append(tmp)
-            data.append(tmp2)
-        
-        # now, fill data structure in z,y,x loops for correct x,y,z order
-        for k in range(kdim):
-            for j in range(jdim):
-                for i in range(idim):
-                    data[i][j][k] = array[n]
-                    n += 1
-        return data
+        # SHEMAT arrays are x-dominant: reshape to array[z,y,x] and transpose
+        return np.asarray(array).reshape((kdim, jdim, idim)).transpose(2, 1, 0)
         
     def get_cell_centres(self):
         """Calculate centre of cells in absolute values
@@ -689,21 +1689,15 @@ class Shemat_file:
         Cell centres are stored in object variables
         
         self.centre_x, self.centre_y, self.centre_z
+        
+        (as lists, the values are taken from self.get_geometry)
         """
         # reload cell boundaries
         self.get_cell_boundaries()
-        # calculate centres for x
-        self.centre_x = []
-        for i in range(len(self.boundaries_x[:-1])):
-            self.centre_x.append((self.boundaries_x[i+1]-self.boundaries_x[i])/2.+self.boundaries_x[i])
-        # calculate centres for y
-        self.centre_y = []
-        for i in range(len(self.boundaries_y[:-1])):
-            self.centre_y.append((self.boundaries_y[i+1]-self.boundaries_y[i])/2.+self.boundaries_y[i])
-        # calculate centres for z
-        self.centre_z = []
-        for i in range(len(self.boundaries_z[:-1])):
-            self.centre_z.append((self.boundaries_z[i+1]-self.boundaries_z[i])/2.+self.boundaries_z[i])
+        geometry = self.get_geometry()
+        self.centre_x = geometry.centre_x.tolist()
+        self.centre_y = geometry.centre_y.tolist()
+        self.centre_z = geometry.centre_z.tolist()
             
     def update_model_from_geomodeller_xml_file(self, geomodeller_xml_file, **kwds):
         """Determine the model geology from a geological model created with GeoModeller
@@ -740,13 +1734,13 @@ class Shemat_file:
         if kwds.has_key('lower_left_z') and kwds['lower_left_z'] != '':
             zmin = kwds['lower_left_z']
         # check model extents of GeoModeller model and SHEMAT file
-        self.get_cell_centres()
+        geometry = self.get_geometry()
         geo_new = [] # new geology array
-        n_cells = len(self.centre_z) * len(self.centre_y) * len(self.centre_x)
+        n_cells = len(geometry.centre_z) * len(geometry.centre_y) * len(geometry.centre_x)
         i = 0
-        for z in self.centre_z:
-            for y in self.centre_y:
-                for x in self.centre_x:
+        for z in geometry.centre_z:
+            for y in geometry.centre_y:
+                for x in geometry.centre_x:
                     # geo_new.append(g_api.get_lithology(x,y,-geo_dz+z)) # old version
                     print "process cell %8d of %d, %4.1f Percent" % (i, n_cells, (float(i)/float(n_cells)*100))
                     geo_new.append(g_api.get_lithology(xmin + x, ymin + y, zmin + z))
@@ -942,99 +1936,98 @@ class Shemat_file:
         self.set_array(property, prop_array_new)
         
     def get_model_extent(self):
-        """determine model extent in x,y,z direction from self.boundaries_x,y,z
+        """determine model extent in x,y,z direction (see self.get_geometry)
         return as tuple (extent_x, extent_y, extent_z) and store in self.extent_x, self.extent_y, self.extent_z"""
-        # recompute boundaries (always or trigger with kwd?)
-        self.get_cell_boundaries()
-        self.extent_x = max(self.boundaries_x) - min(self.boundaries_x)    
-        self.extent_y = max(self.boundaries_y) - min(self.boundaries_y)    
-        self.extent_z = max(self.boundaries_z) - min(self.boundaries_z)
+        geometry = self.get_geometry()
+        self.extent_x = geometry.extent_x
+        self.extent_y = geometry.extent_y
+        self.extent_z = geometry.extent_z
         return (self.extent_x, self.extent_y, self.extent_z)
             
             
     def get_cell_boundaries(self):
         """calculate cell boundaries from arrays DELX, DELY, DELZ and save
-        to self.boundaries_x, self.boundaries_y, self.boundaries_z"""
-        delx = self.get_array("DELX")
-        dely = self.get_array("DELY")
-        delz = self.get_array("DELZ")
-        # x
-        b = []
-        laststep = 0
-        b.append(laststep)
-        for step in delx:
-            b.append(laststep+step)
-            laststep += step
-        self.boundaries_x = b
-        # y
-        b = []
-        laststep = 0
-        b.append(laststep)
-        for step in dely:
-            b.append(laststep+step)
-            laststep += step
-        self.boundaries_y = b
-        # z
-        b = []
-        laststep = 0
-        b.append(laststep)
-        for step in delz:
-            b.append(laststep+step)
-            laststep += step
-        self.boundaries_z = b
+        to self.boundaries_x, self.boundaries_y, self.boundaries_z
+        (as lists, the values are taken from self.get_geometry)"""
+        geometry = self.get_geometry()
+        self.boundaries_x = geometry.boundaries_x.tolist()
+        self.boundaries_y = geometry.boundaries_y.tolist()
+        self.boundaries_z = geometry.boundaries_z.tolist()
+        
+    def get_geometry(self):
+        """Get the geometry of the model grid
+        
+        Cell widths, boundaries, centres, the model extent and the volume of all
+        cells are computed once from DELX, DELY and DELZ and stored as numpy
+        arrays in a GridGeometry object (see there). The object is cached in
+        self.geometry and automatically computed again if DELX, DELY or DELZ
+        are changed (self.set_array, self.set, self.update_del).
         
+        **Returns**:
+            GridGeometry object
+        """
+        try:
+            return self.geometry
+        except AttributeError:
+            self.geometry = GridGeometry(self.get_array("DELX"),
+                                         self.get_array("DELY"),
+                                         self.get_array("DELZ"))
+            return self.geometry
+
+    def reset_geometry(self, var_name=None):
+        """Discard the cached grid geometry (see self.get_geometry)
+        
+        **Optional keywords**:
+            - *var_name* = string : name of changed variable; the geometry is only
+            discarded if it is one of DELX, DELY, DELZ (default: always)
+        """
+        if var_name is None or var_name.lstrip("#").strip() in ("DELX", "DELY", "DELZ"):
+            if self.__dict__.has_key('geometry'):
+                del self.geometry
         
     def get_array_as_xyz_structure(self,var_name):
         """read variable and order into 3-D structure as
         data[i][j][k]
         with i,j,k: counters in x,y,z direction
+        the structure is a transposed view (array[x,y,z]) of a copy of the variable
+        array (see self.get_np_array for a view in SHEMAT array order)
         arguments:
-        var_name : property from SHEMAT file (read again in this function! rewrite?)
+        var_name : property from SHEMAT file
         """
-        # initialize output array
-        data = []
         # read array from SHEMAT file
         ori_array = self.get_array(var_name)
         # read array length from SHEMAT file
         idim = int(self.get("IDIM"))
         jdim = int(self.get("JDIM"))
         kdim = int(self.get("KDIM"))
-        # iterate over dimensions and re-sort array
-        n = 0
-        # initialize array in x,y,z-order
-        data = []
-        for i in range(idim):
-            tmp2 = []
-            for j in range(jdim):
-                tmp = [0 for k in range(kdim)]
-                tmp2.append(tmp)
-            data.append(tmp2)
-        from pylab import shape
-        # print shape(data)
-        # now, fill data structure in z,y,x loops for correct x,y,z order
-        for k in range(kdim):
-            for j in range(jdim):
-                for i in range(idim):
-                    # print n
-                    try:
-                        data[i][j][k] = ori_array[n]
-                    except IndexError:
-                        print "PROBLEM WITH INDEX in self.get_array_as_xyz_structure"
-                        print "assigned 0 to index value %d" % n
-                        print "original array length: %d" % len(ori_array)
-                    n += 1
-        return data
+        # SHEMAT arrays are x-dominant: reshape to array[z,y,x] and transpose
+        return ori_array.reshape((kdim, jdim, idim)).transpose(2, 1, 0)
 
     def get_np_array(self, var_name):
         """Get variable as 3-D numpy array
 
         ..Note: due to SHEMAT array set-up, the order is z-dominant (array[z,y,x])   
 
+        The returned array is a view of the cached array, changes are written to
+        the file lines with self.flush (or self.write_file), see
+        self.mark_modified_arrays. For POR, PERM and PRES, a copy with positive
+        values is returned (see self.get_array).
+
         **Arguments**:
             - *var_name* = string : Name of SHEMAT variable
         """
-        # read array from SHEMAT file
-        ori_array = np.array(self.get_array(var_name))
+        name = var_name.lstrip("#").strip()
+        if name == "POR" or name == "PERM" or name == "PRES":
+            # copy with positive values
+            ori_array = self.get_array(name)
+        else:
+            if not self.array_cache.has_key(name):
+                # read array from SHEMAT file into the array cache
+                self.get_var_values(var_name)
+            ori_array = self.array_cache[name]
+            # view can be changed: check for changes when the array is written
+            if not self.array_checksums.has_key(name):
+                self.array_checksums[name] = zlib.crc32(ori_array)
         # read array length from SHEMAT file
         idim = int(self.get("IDIM"))
         jdim = int(self.get("JDIM"))
@@ -1043,39 +2036,25 @@ class Shemat_file:
 
 
     
-    def calc_mean_formation_temp(self, formation_id):
+    def calc_mean_formation_temp(self, formation_id, **kwds):
         """Caluclate the mean temperature for one formation at each location
         
         Mean temperatures in z-direction are calculated at every location (x,y) for
         a specified geological formation, for example to create a map of mean temperatures
+        (see self.calc_mean_formation_value)
         
         **Arguments**:
             - *formation_id* = string : corresponding to the property id in Shemat/ Geology Variable
+        
+        **Optional keywords**:
+            - *weighted* = True/False : mean value weighted with layer thickness (DELZ)
+            - *as_array* = True/False : return 2-D array[y,x] instead of 1-D list
+        
         **Returns**:
-            - *mean_temp* = 1-D list of mean temperatures (array with 2-D grid values in 1-D structure)
+            - *mean_temp* = 1-D list of mean temperatures, 2-D grid values in 1-D structure
+            (0 where the formation does not exist)
         """
-        # load geology data to xyz array
-        geology_xyz = self.get_array_as_xyz_structure("GEOLOGY")
-        temp_xyz = self.get_array_as_xyz_structure("TEMP")
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        # now, iterate over x,y in geology array
-        temp_xy = []
-        for i in range(idim):
-            for j in range(jdim):
-                localtemp = 0
-                i = 0
-                for k in range(kdim):
-                    if geology_xyz[i][j][k] == formation_id:
-                        localtemp += temp_xyz[i][j][k]
-                        i = i + 1
-                if i != 0:
-                    meantemp = localtemp / i
-                else:
-                    meantemp = 0
-                temp_xy.append(meantemp)             
-        return temp_xy
+        return self.calc_mean_formation_value(formation_id, "TEMP", **kwds)
     
     def create_property_histogram(self, formation_id, property, **kwds):
         """create a histogram for a defined property, e.g.: histogram for
@@ -1087,17 +2066,8 @@ class Shemat_file:
         show = True/False: directly show plot of histogram
         property_name = Name of property, for title of plot
         """
-        geology_xyz = self.get_array_as_xyz_structure("GEOLOGY")
-        property_xyz = self.get_array_as_xyz_structure(property)
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        hist_data = []
-        for i in range(idim):
-            for j in range(jdim):
-                for k in range(kdim):
-                    if geology_xyz[i][j][k] == formation_id:
-                        hist_data.append(property_xyz[i][j][k])
+        geology = self.get_array("GEOLOGY")
+        hist_data = self.get_array(property)[geology == formation_id]
         import matplotlib.pyplot as plt
 #        from pylab import hist, show, title, text, figure
         fig = plt.figure()
@@ -1143,7 +2113,7 @@ class Shemat_file:
         else:
             fig.savefig('delimiter_histogram.png')
         
-    def calc_global_mean_value(self, property):
+    def calc_global_mean_value(self, property, **kwds):
         """Calculate the mean value of one property
         
         Calculate the mean value for one SHEMAT property, location based, i.e. the
@@ -1154,32 +2124,17 @@ class Shemat_file:
         
         mean_temp = S1.calc_global_mean_value("TEMP")
         
-        **Arguments**:
-            - *property* = string : Name of SHEMAT property/ variable
-            
-        **Returns**:
-            - *mean_value* = list : 1-D list of mean values at each location (x,y)
-        """
-        property_xyz = self.get_array_as_xyz_structure(property)
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        # now, iterate over x,y in geology array
-        # print idim,jdim,kdim
-        property_xy = []
-        for j in range(jdim):
-            for i in range(idim):
-                local_property = 0
-                n = 0
-                for k in range(kdim):
-                    local_property += property_xyz[i][j][k]
-                    n += 1
-                if n != 0:
-                    property = local_property / n
-                else:
-                    property = 0
-                property_xy.append(property)             
-        return property_xy
+        **Arguments**:
+            - *property* = string : Name of SHEMAT property/ variable
+        
+        **Optional keywords**:
+            - *weighted* = True/False : mean value weighted with layer thickness (DELZ)
+            - *as_array* = True/False : return 2-D array[y,x] instead of 1-D list
+            
+        **Returns**:
+            - *mean_value* = 1-D list of mean values at each location (x,y)
+        """
+        return self.calc_mean_formation_value(None, property, **kwds)
     
     def random_property_change(self, formation_id, property, **kwds):
         """Add a random vaule to a property, based on geology identifyer
@@ -1230,7 +2185,7 @@ class Shemat_file:
         
             
     
-    def calc_mean_formation_value(self, formation_id, property):
+    def calc_mean_formation_value(self, formation_id, property, **kwds):
         """Calculate the mean value for one property in z-direction for one formation
         
         The mean value for one property in z-direction is calculated at every
@@ -1238,36 +2193,40 @@ class Shemat_file:
         
         **Arguments**:
             - *formation_id* = int : corresponding to the property id in Shemat/ Geology Variable
+            (None: all formations)
             - *property* = sring : can be any of the properties/ variables  in the SHEMAT nml/nlo files, e.g.: DICHTE, PERM, POR
         
+        **Optional keywords**:
+            - *weighted* = True/False : mean value weighted with layer thickness (DELZ),
+            for meshes with varying layer thickness (default: False)
+            - *as_array* = True/False : return 2-D array[y,x] of mean values instead
+            of 1-D list (default: False)
+        
         **Returns**:
-            *mean_value* = 1-D list of mean values at every location
+            *mean_value* = 1-D list of mean values at every location (x-dominance, 0 where
+            the formation does not exist)
         """
-        # load geology data to xyz array
-        geology_xyz = self.get_array_as_xyz_structure("GEOLOGY")
-        property_xyz = self.get_array_as_xyz_structure(property)
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        # now, iterate over x,y in geology array
-        # print idim,jdim,kdim
-        property_xy = []
-        for j in range(jdim):
-            for i in range(idim):
-                local_property = 0
-                n = 0
-                for k in range(kdim):
-                    if geology_xyz[i][j][k] == formation_id:
-                        local_property += property_xyz[i][j][k]
-                        n += 1
-                if n != 0:
-                    property = local_property / n
-                else:
-                    property = 0
-                property_xy.append(property)             
-        return property_xy
+        geometry = self.get_geometry()
+        shape = (geometry.kdim, geometry.jdim, geometry.idim)
+        property_zyx = self.get_array(property).reshape(shape)
+        if formation_id is None:
+            mask = np.ones(shape, dtype=bool)
+        else:
+            mask = self.get_array("GEOLOGY").reshape(shape) == formation_id
+        # reduce masked values along z-axis
+        if kwds.has_key('weighted') and kwds['weighted']:
+            weights = mask * geometry.delz[:, np.newaxis, np.newaxis]
+        else:
+            weights = mask * 1.
+        sum_weights = weights.sum(axis=0)
+        sum_property = (weights * np.where(mask, property_zyx, 0.)).sum(axis=0)
+        property_xy = np.zeros(sum_weights.shape)
+        np.divide(sum_property, sum_weights, out=property_xy, where=(sum_weights > 0))
+        if kwds.has_key('as_array') and kwds['as_array']:
+            return property_xy
+        return property_xy.ravel().tolist()
 
-    def calc_formation_isopach(self, formation_id):
+    def calc_formation_isopach(self, formation_id, **kwds):
         """Calculate isopach map for one formation, based on discretization
         
         Calculate an isopach map for a formation based on the discretization
@@ -1276,87 +2235,81 @@ class Shemat_file:
         **Arguments**:
             - *formation_id* = int : corresponding to the property id in Shemat/ Geology Variable
         
+        **Optional keywords**:
+            - *as_array* = True/False : return 2-D array[y,x] instead of 1-D list (default: False)
+        
         **Returns**:
-            *isopach_xy[n]* = list : 1D list of isopach values
+            *isopach_xy* = 1-D list of isopach values
         """
-        # load geology data to xyz array
-        geology_xyz = self.get_array_as_xyz_structure("GEOLOGY")
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        # now, iterate over x,y in geology array
-        delz = self.get_array("DELZ")
-        print idim,jdim,kdim
-        isopach_xy = []
-        for j in range(jdim):
-            for i in range(idim):
-                local_isopach = 0
-                for k in range(kdim):
-                    if geology_xyz[i][j][k] == formation_id:
-                        local_isopach += float(delz[k])
-                isopach_xy.append(local_isopach)             
-        return isopach_xy
+        geometry = self.get_geometry()
+        shape = (geometry.kdim, geometry.jdim, geometry.idim)
+        mask = self.get_array("GEOLOGY").reshape(shape) == formation_id
+        # sum of layer thickness in z-direction
+        isopach_xy = (mask * geometry.delz[:, np.newaxis, np.newaxis]).sum(axis=0)
+        if kwds.has_key('as_array') and kwds['as_array']:
+            return isopach_xy
+        return isopach_xy.ravel().tolist()
     
-    def calc_formation_temp_gradient(self, formation_id):
+    def calc_formation_temp_gradient(self, formation_id, **kwds):
         """Calculate the 1-D temperature gradient within one formation
         
         Function calculates temperature gradient in z-direction in one formation and
-        returns (x,y)-values in a list, e.g. to create maps of temperature gradients
+        returns (x,y)-values, e.g. to create maps of temperature gradients; the gradient
+        is positive for temperatures increasing with depth.
         
-        ..Note..: The function only works properly for formations continuous in z-direction
+        The gradient is either calculated between the lowest and the highest cell
+        of the formation at each location (method 'interval') or determined with a
+        least-squares fit to the temperatures in all cells of the formation (method
+        'least_squares'). For formations with several intervals at one location, all
+        intervals are considered.
         
         **Arguments**:
             - *formation_id* = int : corresponding to the property id in Shemat/ Geology Variable
         
+        **Optional keywords**:
+            - *method* = 'interval', 'least_squares' : calculation of gradient (default: 'interval')
+            - *as_array* = True/False : return 2-D array[y,x] instead of 1-D list (default: False)
+        
         **Returns**:
-            *temp_gradient_xy[n]* = list : 1D list of isopach values
+            *temp_gradient_xy* = 1-D list of temperature gradients; NaN where the
+            formation does not exist or consists of only one cell
         """
-        # load geology data to xyz array
-        geology_xyz = self.get_array_as_xyz_structure("GEOLOGY")
-        # load temperature data to xyz array
-        temperature_xyz = self.get_array_as_xyz_structure("# TEMP") 
-        # get cell centres
-        cell_centres = self.get_cell_centres()
-        
-        # now, iterate over x,y in geology array
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        print idim,jdim,kdim
-        temp_gradient_xy = []
-        for j in range(jdim):
-            for i in range(idim):
-                in_formation = False
-                max_reached = False
-                for k in range(kdim):
-                    if not in_formation and (geology_xyz[i][j][k] == formation_id):
-                        # lower boundary
-                        min_temp = temperature_xyz[i][j][k]
-                        z_min = self.centre_z[k]
-                        in_formation = True
-                    elif in_formation and (geology_xyz[i][j][k] != formation_id):
-                        # first cell above formation
-                        max_temp = temperature_xyz[i][j][k-1]
-                        z_max = self.centre_z[k-1]
-                        max_reached = True
-                    # if max_reached, calculate temperature gradient
-                    if max_reached:
-                        if not (z_min == z_max):
-                            temp_gradient_xy.append((max_temp - min_temp) / (z_min - z_max))
-                        else:
-                            print("Problem with values: z_min equal to z_max!")
-                            print("Temperature gradient is set to 0")
-                            temp_gradient_xy.append(0.)
-                        break # loop in z-direction
-        return temp_gradient_xy
-       
-        
+        method = kwds.get('method', 'interval')
+        if method not in ('interval', 'least_squares'):
+            raise ValueError("method must be 'interval' or 'least_squares'")
+        geometry = self.get_geometry()
+        shape = (geometry.kdim, geometry.jdim, geometry.idim)
+        mask = self.get_array("GEOLOGY").reshape(shape) == formation_id
+        temperature = self.get_array("# TEMP").reshape(shape)
+        centre_z = geometry.centre_z[:, np.newaxis, np.newaxis]
+        if method == 'interval':
+            # lowest and highest cell of formation in each column
+            k_min = np.argmax(mask, axis=0)
+            k_max = geometry.kdim - 1 - np.argmax(mask[::-1], axis=0)
+            (j, i) = np.ogrid[0:geometry.jdim, 0:geometry.idim]
+            dz = geometry.centre_z[k_min] - geometry.centre_z[k_max]
+            dt = temperature[k_max, j, i] - temperature[k_min, j, i]
+        else:
+            # least-squares fit of temperature with elevation in each column
+            n = mask.sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_z = (mask * centre_z).sum(axis=0) / n
+                mean_temp = np.where(mask, temperature, 0.).sum(axis=0) / n
+            dev_z = np.where(mask, centre_z - mean_z, 0.)
+            dt = -(dev_z * np.where(mask, temperature - mean_temp, 0.)).sum(axis=0)
+            dz = (dev_z**2).sum(axis=0)
+        temp_gradient_xy = np.empty(dz.shape)
+        temp_gradient_xy.fill(np.nan)
+        np.divide(dt, dz, out=temp_gradient_xy, where=(mask.any(axis=0) & (dz != 0)))
+        if kwds.has_key('as_array') and kwds['as_array']:
+            return temp_gradient_xy
+        return temp_gradient_xy.ravel().tolist()
         
          
     def property_xy_to_2D_points(self, property_xy):
         """create a list with coordinates and property values, e.g. for
         further data processing, import into MapInfo, etc.
-        property_xy : list with property values, e.g. created from calc_mean_formation_value()
+        property_xy : list or 2-D array with property values, e.g. created from calc_mean_formation_value()
         up to now: only regular discretization in x- and y-direction!
         returns list property_2D_points[x_coord, y_coord, property_value]
         """
@@ -1367,7 +2320,7 @@ class Shemat_file:
         n = 0
         property_2D_points = []
         # resize to 1-D array
-        
+        property_xy = np.ravel(property_xy)
         for j in range(jdim):
             row = []
             for i in range(idim):
@@ -1377,47 +2330,81 @@ class Shemat_file:
          
     def mu(self,T):
         """returns dynmaic viscosity of water at a given temperature
-        T : temperature in degree Celcius
+        T : temperature in degree Celcius (float or array)
         """
         # factors: taken from wikipedia page on viscosity
         A = 2.414E-5
         B = 247.8
         C = 140
-        T += 273.15  # convert to T in Kelvin
-        return A * 10 ** (B/(T-C))
+        T = np.asarray(T, dtype=np.float64) + 273.15  # convert to T in Kelvin
+        return A * np.power(10., B/(T-C))
+    
+    def calc_hydraulic_conductivity(self):
+        """Calculate the hydraulic conductivity in all cells
+        
+        The hydraulic conductivity is calculated from permeability (PERM), density
+        (DICHTE) and the temperature dependent viscosity of water (see self.mu) in
+        all cells at once.
+        
+        **Returns**:
+            - *conductivity* = 3-D array[z,y,x] of hydraulic conductivity values
+        """
+        g = 9.81 # grav acceleration
+        geometry = self.get_geometry()
+        shape = (geometry.kdim, geometry.jdim, geometry.idim)
+        permeability = self.get_array("PERM").reshape(shape)
+        density = self.get_array("DICHTE").reshape(shape)
+        temperature = self.get_array("TEMP").reshape(shape)
+        return permeability * density * g / self.mu(temperature)
     
-    def calc_local_transmissivity(self,formation_id):
+    def calc_local_transmissivity(self, formation_id, **kwds):
         """Calculate the transmissivity at every location for one formation/ aquifer
+        
+        The hydraulic conductivity of each cell in the formation is multiplied with
+        the thickness of the layer (DELZ) and summed up in z-direction.
 
         **Arguments**:
             - *formation_id* = string : corresponding to the property id in Shemat/ Geology Variable
         
+        **Optional keywords**:
+            - *as_array* = True/False : return 2-D array[y,x] instead of 1-D list (default: False)
+        
         **Returns**:
             - *transmissivity_xy* = 1-D list of transmissivity values for each location
         """
-        # load geology data to xyz array
-        geology_xyz = self.get_array_as_xyz_structure("GEOLOGY")
-        density_xyz = self.get_array_as_xyz_structure("DICHTE")
-        permeability_xyz = self.get_array_as_xyz_structure("PERM")
-        temp_xyz = self.get_array_as_xyz_structure("TEMP")
-        g = 9.81 # grav acceleration
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        dz = int(self.get_array("DELZ")[0])
-        # now, iterate over x,y in geology array
-        transmissivity_xy = []
-        for j in range(jdim):
-            for i in range(idim):
-                local_transmissivity = 0
-                for k in range(kdim):
-                    if geology_xyz[i][j][k] == formation_id:
-                        # calculate local hydraulic conductivity
-                        K = permeability_xyz[i][j][k] * density_xyz[i][j][k] * g / self.mu(temp_xyz[i][j][k])
-#                        K = 1E-13 * density_xyz[i][j][k] * g / viscosity
-                        local_transmissivity += K * dz
-                transmissivity_xy.append(local_transmissivity)             
-        return transmissivity_xy
+        geometry = self.get_geometry()
+        shape = (geometry.kdim, geometry.jdim, geometry.idim)
+        mask = self.get_array("GEOLOGY").reshape(shape) == formation_id
+        conductivity = self.calc_hydraulic_conductivity()
+        transmissivity_xy = np.where(mask, conductivity * geometry.delz[:, np.newaxis, np.newaxis],
+                                     0.).sum(axis=0)
+        if kwds.has_key('as_array') and kwds['as_array']:
+            return transmissivity_xy
+        return transmissivity_xy.ravel().tolist()
+    
+    def calc_transmissivity_maps(self):
+        """Calculate the transmissivity at every location for all formations
+        
+        Transmissivity maps (see self.calc_local_transmissivity) are determined for
+        all formations at once, with the sum over the cells of each formation and
+        location calculated with np.bincount.
+        
+        **Returns**:
+            Tuple (formation_ids, transmissivity): 1-D array of formation ids and
+            3-D array[n_formations,y,x] of transmissivity values
+        """
+        geometry = self.get_geometry()
+        shape = (geometry.kdim, geometry.jdim, geometry.idim)
+        n_xy = geometry.jdim * geometry.idim
+        geology = self.get_array("GEOLOGY").astype(int)
+        (formation_ids, formation_index) = np.unique(geology, return_inverse=True)
+        transmissivity = self.calc_hydraulic_conductivity() * \
+                         geometry.delz[:, np.newaxis, np.newaxis]
+        # combined index of formation and location (x,y) for each cell
+        label = formation_index * n_xy + np.tile(np.arange(n_xy), geometry.kdim)
+        transmissivity = np.bincount(label, weights = transmissivity.ravel(),
+                                     minlength = len(formation_ids) * n_xy)
+        return (formation_ids, transmissivity.reshape(len(formation_ids), geometry.jdim, geometry.idim))
         
     
     def create_shemat_voxet_model(self,property,**kwds):
@@ -1531,12 +2518,12 @@ class Shemat_file:
         # convert to numpy array
         grid = np.array(array)
 
-        # get cell centers as coordinates
-        self.get_cell_boundaries()
+        # get cell boundaries as coordinates
+        geometry = self.get_geometry()
         
-        gridToVTK(vtk_filename, np.array(self.boundaries_x), 
-                  np.array(self.boundaries_y), 
-                  np.array(self.boundaries_z),
+        gridToVTK(vtk_filename, geometry.boundaries_x, 
+                  geometry.boundaries_y, 
+                  geometry.boundaries_z,
                   cellData = {property_name: grid})
     
     def get_origin(self):
@@ -1685,89 +2672,62 @@ class Shemat_file:
             else:
                 fig.savefig('2D_property_section_plot.png')  
                 
-    def get_slice(self, property, direction, position):
+    def get_slice(self, property, direction, position, **kwds):
         """get data for a property in a slice through the model, along a coordinate
         direction for a specified position;
-        data is stored in a "xy"-type array, similar to calculated mean properties, etc.
-        and can be plotted with self.create_2D_property_plot or exported to an ASCII
-        grid file;
+        data is returned as 2-D numpy array, a view of the 3-D array of the property
+        (see self.get_np_array): array[z,y] for direction 'x', array[z,x] for
+        direction 'y' and array[y,x] for direction 'z'. The slice can be plotted with
+        self.create_2D_property_plot or exported to an ASCII grid file;
+        Note: changes to the view change the cached property array and are written
+        to the file with self.flush or self.write_file (see self.mark_modified_arrays).
+        For POR, PERM and PRES, the slice is taken from a copy with positive values
+        (see self.get_array): changes to these slices are lost, use self.set_array!
         property = SHEMAT variable name, e.g. "TEMP" for temperature
         direction = 'x','y','z' : coordinate direction
         position = float : position of slice in real-world coordinates
+        optional keywords:
+        as_list = True/False : return a flat list, as in "xy"-type arrays of
+        calculated mean properties, etc. (default: False)
         returns property_xy array"""
         
         # get data at position and store in property array
-        try:
-            self.boundaries_x
-        except AttributeError:
-            self.get_cell_boundaries()
+        geometry = self.get_geometry()
         try:
             self.origin_x
         except AttributeError:
             self.get_model_origin()
-
-        
-        # find position in array
-        property_xyz = self.get_array_as_xyz_structure(property)
         
         if direction == 'x':
-            # check if position is within bounds of model
-            if position > self.boundaries_x[-1]:
-                print "Position %s is out of bounds for direction x (max: %f)" % (position, self.boundaries_x[-1])
-                raise ValueError
-            rel_position = (position - self.origin_x)
-            for i,b in enumerate(self.boundaries_x):
-                if b > rel_position:
-                    # correct position in the array is corresponding to the cell centre
-                    # of the last cell!
-                    array_pos = i-1
-                    break
-            # now determine correct slice; implementation with for-loops
-            # as correct array assignment with Python somehow doesn't want to work...
-            property_slice = []
-            for z in range(self.kdim):
-                for y in range(self.jdim):
-                    property_slice.append(property_xyz[array_pos][y][z])
+            (boundaries, origin) = (geometry.boundaries_x, self.origin_x)
         elif direction == 'y':
-            # check if position is within bounds of model
-            if position > self.boundaries_y[-1]:
-                print "Position %s is out of bounds for direction y (max: %f)" % (position, self.boundaries_y[-1])
-                raise ValueError
-            rel_position = (position - self.origin_y)
-            for i,b in enumerate(self.boundaries_y):
-                if b > rel_position:
-                    # correct position in the array is corresponding to the cell centre
-                    # of the last cell!
-                    array_pos = i-1
-                    break
-            # now determine correct slice; implementation with for-loops
-            # as correct array assignment with Python somehow doesn't want to work...
-            property_slice = []
-            for z in range(self.kdim):
-                for x in range(self.idim):
-                    property_slice.append(property_xyz[x][array_pos][z])
+            (boundaries, origin) = (geometry.boundaries_y, self.origin_y)
         elif direction == 'z':
-            # check if position is within bounds of model
-            if position > self.boundaries_z[-1]:
-                print "Position %s is out of bounds for direction z (max: %f)" % (position, self.boundaries_z[-1])
-                raise ValueError
-            rel_position = (position - self.origin_z)
-            for i,b in enumerate(self.boundaries_z):
-                if b > rel_position:
-                    # correct position in the array is corresponding to the cell centre
-                    # of the last cell!
-                    array_pos = i-1
-                    break
-            # now determine correct slice; implementation with for-loops
-            # as correct array assignment with Python somehow doesn't want to work...
-            property_slice = []
-            for y in range(self.jdim):
-                for x in range(self.idim):
-                    property_slice.append(property_xyz[x][y][array_pos])
+            (boundaries, origin) = (geometry.boundaries_z, self.origin_z)
         else:
             print "Direction " + direction + " not correctly defined"
             raise AttributeError
-
+        # check if position is within bounds of model
+        rel_position = (position - origin)
+        if rel_position < boundaries[0] or rel_position > boundaries[-1]:
+            print "Position %s is out of bounds for direction %s (min: %f, max: %f)" % \
+                (position, direction, boundaries[0] + origin, boundaries[-1] + origin)
+            raise ValueError
+        # correct position in the array is corresponding to the cell centre
+        # of the last cell!
+        array_pos = min(np.searchsorted(boundaries, rel_position, side='right') - 1,
+                        len(boundaries) - 2)
+        
+        property_xyz = self.get_np_array(property)
+        if direction == 'x':
+            property_slice = property_xyz[:, :, array_pos]
+        elif direction == 'y':
+            property_slice = property_xyz[:, array_pos, :]
+        else:
+            property_slice = property_xyz[array_pos, :, :]
+        
+        if kwds.has_key('as_list') and kwds['as_list']:
+            return property_slice.ravel().tolist()
         return property_slice
     
     def get_array_pos_xyz(self,x,y,z,**kwds):
@@ -1825,28 +2785,25 @@ class Shemat_file:
                 raise ValueError
                 
             
-            try:
-                self.boundaries_x
-            except AttributeError:
-                self.get_cell_boundaries()
+            geometry = self.get_geometry()
     
-            for i,x_bound in enumerate(self.boundaries_x):
-                if (x - origin_x) > self.boundaries_x[-1]:
-                    print "Position %s is out of bounds for direction x (max: %.2f)" % (x, self.boundaries_x[-1]+origin_x)
+            for i,x_bound in enumerate(geometry.boundaries_x):
+                if (x - origin_x) > geometry.boundaries_x[-1]:
+                    print "Position %s is out of bounds for direction x (max: %.2f)" % (x, geometry.boundaries_x[-1]+origin_x)
                     raise ValueError
                 if x_bound > (x - origin_x): 
                     x_pos = i-1 # array position corresponds to cell centre of cell before boundary!
                     break
-            for j,y_bound in enumerate(self.boundaries_y):
-                if (y - origin_y) > self.boundaries_y[-1]:
-                    print "Position %s is out of bounds for direction y (max: %.2f)" % (y, self.boundaries_y[-1]+origin_y)
+            for j,y_bound in enumerate(geometry.boundaries_y):
+                if (y - origin_y) > geometry.boundaries_y[-1]:
+                    print "Position %s is out of bounds for direction y (max: %.2f)" % (y, geometry.boundaries_y[-1]+origin_y)
                     raise ValueError
                 if y_bound > (y - origin_y): 
                     y_pos = j-1 # array position corresponds to cell centre of cell before boundary!
                     break
-            for k,z_bound in enumerate(self.boundaries_z):
-                if (z - origin_z) > self.boundaries_z[-1]:
-                    print "Position %s is out of bounds for direction z (max: %.2f)" % (z, self.boundaries_z[-1]+origin_z)
+            for k,z_bound in enumerate(geometry.boundaries_z):
+                if (z - origin_z) > geometry.boundaries_z[-1]:
+                    print "Position %s is out of bounds for direction z (max: %.2f)" % (z, geometry.boundaries_z[-1]+origin_z)
                     raise ValueError
                 if z_bound > (z - origin_z): 
                     z_pos = k-1 # array position corresponds to cell centre of cell before boundary!
@@ -1856,6 +2813,65 @@ class Shemat_file:
             else:
                 return x_pos + self.idim * y_pos + self.idim * self.jdim * z_pos
     
+    def get_array_pos_xyz_many(self, xs, ys, zs, **kwds):
+        """Determine the array positions of many real-world coordinate values
+        
+        Vectorized version of self.get_array_pos_xyz: the cells of all points
+        are determined at once with a binary search (numpy.searchsorted) on the
+        cell boundaries of the grid geometry (self.get_geometry). Points outside
+        of the model do not raise an exception, but are marked in a boolean
+        mask.
+        
+        **Arguments**:
+             - *xs, ys, zs* = 1-D arrays (or lists) of floats : positions of points
+
+        **Optional Keywords**:
+            - *relative* = True/ False: relative to model origin (i.e.: not in real-world
+            coordinates).
+
+        **Returns**:
+            Tuple (pos, i, j, k, valid) of 1-D numpy arrays:
+            - *pos* = int array : position in SHEMAT 1-D arrays
+            - *i, j, k* = int arrays : array position in 3-D
+            - *valid* = bool array : True if point is within the model range
+            Positions of points outside of the model are set to -1.
+        """
+        if kwds.has_key('relative') and kwds['relative']:
+            # get value relative to model origin, not in real-world coordinates!
+            origin_x = 0
+            origin_y = 0
+            origin_z = 0
+        else:
+            try:
+                self.origin_z
+            except AttributeError:
+                self.get_model_origin()
+            origin_x = self.origin_x
+            origin_y = self.origin_y
+            origin_z = self.origin_z
+        geometry = self.get_geometry()
+        valid = np.ones(np.shape(np.atleast_1d(xs)), dtype=bool)
+        ijk = []
+        for (coords, origin, boundaries) in ((xs, origin_x, geometry.boundaries_x),
+                                             (ys, origin_y, geometry.boundaries_y),
+                                             (zs, origin_z, geometry.boundaries_z)):
+            rel = np.atleast_1d(np.asarray(coords, dtype=np.float64)) - origin
+            # array position corresponds to cell centre of cell before boundary!
+            pos = np.searchsorted(boundaries, rel, side='right') - 1
+            # points on the upper model boundary are assigned to the last cell
+            pos = np.minimum(pos, len(boundaries) - 2)
+            # NaN values are not valid (no warning required)
+            with np.errstate(invalid='ignore'):
+                valid &= (rel >= boundaries[0]) & (rel <= boundaries[-1])
+            ijk.append(pos)
+        (i, j, k) = ijk
+        pos = i + geometry.idim * j + geometry.idim * geometry.jdim * k
+        pos[~valid] = -1
+        i[~valid] = -1
+        j[~valid] = -1
+        k[~valid] = -1
+        return (pos, i, j, k, valid)
+    
     def get_value_xyz(self,property,x,y,z,interpolate=True,**kwds):
         """Get the (interpolated )value of the property at real-world position
         
@@ -1912,28 +2928,25 @@ class Shemat_file:
                 raise ValueError
                 
             
-            try:
-                self.boundaries_x
-            except AttributeError:
-                self.get_cell_boundaries()
+            geometry = self.get_geometry()
     
-            for i,x_bound in enumerate(self.boundaries_x):
-                if (x - origin_x) > self.boundaries_x[-1]:
-                    print "Position %s is out of bounds for direction x (max: %.2f)" % (x, self.boundaries_x[-1]+origin_x)
+            for i,x_bound in enumerate(geometry.boundaries_x):
+                if (x - origin_x) > geometry.boundaries_x[-1]:
+                    print "Position %s is out of bounds for direction x (max: %.2f)" % (x, geometry.boundaries_x[-1]+origin_x)
                     raise ValueError
                 if x_bound > (x - origin_x): 
                     x_pos = i-1 # array position corresponds to cell centre of cell before boundary!
                     break
-            for j,y_bound in enumerate(self.boundaries_y):
-                if (y - origin_y) > self.boundaries_y[-1]:
-                    print "Position %s is out of bounds for direction y (max: %.2f)" % (y, self.boundaries_y[-1]+origin_y)
+            for j,y_bound in enumerate(geometry.boundaries_y):
+                if (y - origin_y) > geometry.boundaries_y[-1]:
+                    print "Position %s is out of bounds for direction y (max: %.2f)" % (y, geometry.boundaries_y[-1]+origin_y)
                     raise ValueError
                 if y_bound > (y - origin_y): 
                     y_pos = j-1 # array position corresponds to cell centre of cell before boundary!
                     break
-            for k,z_bound in enumerate(self.boundaries_z):
-                if (z - origin_z) > self.boundaries_z[-1]:
-                    print "Position %s is out of bounds for direction z (max: %.2f)" % (z, self.boundaries_z[-1]+origin_z)
+            for k,z_bound in enumerate(geometry.boundaries_z):
+                if (z - origin_z) > geometry.boundaries_z[-1]:
+                    print "Position %s is out of bounds for direction z (max: %.2f)" % (z, geometry.boundaries_z[-1]+origin_z)
                     raise ValueError
                 if z_bound > (z - origin_z): 
                     z_pos = k-1 # array position corresponds to cell centre of cell before boundary!
@@ -1947,29 +2960,26 @@ class Shemat_file:
             # determine position of cell centers (not boundaries as for the case above!)
             
             # Use cell centers for interpolation
-            try:
-                self.centre_z
-            except AttributeError:
-                self.get_cell_centres()
+            geometry = self.get_geometry()
 
             
-            for i,x_bound in enumerate(self.centre_x):
-                if (x - origin_x) > self.centre_x[-1]:
-                    print "Position %s is out of bounds for direction x (max: %.2f)" % (x, self.boundaries_x[-1]+origin_x)
+            for i,x_bound in enumerate(geometry.centre_x):
+                if (x - origin_x) > geometry.centre_x[-1]:
+                    print "Position %s is out of bounds for direction x (max: %.2f)" % (x, geometry.boundaries_x[-1]+origin_x)
                     raise ValueError
                 if x_bound >= (x - origin_x): 
                     i = i-1 # array position corresponds to cell centre of cell before boundary!
                     break
-            for j,y_bound in enumerate(self.centre_y):
-                if (y - origin_y) > self.centre_y[-1]:
-                    print "Position %s is out of bounds for direction y (max: %.2f)" % (y, self.boundaries_y[-1]+origin_y)
+            for j,y_bound in enumerate(geometry.centre_y):
+                if (y - origin_y) > geometry.centre_y[-1]:
+                    print "Position %s is out of bounds for direction y (max: %.2f)" % (y, geometry.boundaries_y[-1]+origin_y)
                     raise ValueError
                 if y_bound >= (y - origin_y): 
                     j = j-1 # array position corresponds to cell centre of cell before boundary!
                     break
-            for k,z_bound in enumerate(self.centre_z):
-                if (z - origin_z) > self.centre_z[-1]:
-                    print "Position %s is out of bounds for direction z (max: %.2f)" % (z, self.boundaries_z[-1]+origin_z)
+            for k,z_bound in enumerate(geometry.centre_z):
+                if (z - origin_z) > geometry.centre_z[-1]:
+                    print "Position %s is out of bounds for direction z (max: %.2f)" % (z, geometry.boundaries_z[-1]+origin_z)
                     raise ValueError
                 if z_bound >= (z - origin_z): 
                     k = k-1 # array position corresponds to cell centre of cell before boundary!
@@ -1979,25 +2989,136 @@ class Shemat_file:
             prop = self.get_array(property)
             
             # interpolate values in x-direction for all surrounding cell centers (from volumes to plane)
-            p_x1 = (prop[self.ap(i+1,j,k)] - prop[self.ap(i,j,k)]) / (self.centre_x[i+1]-self.centre_x[i]) \
-                    * ((x - origin_x) - self.centre_x[i]) + prop[self.ap(i,j,k)]
-            p_x2 = (prop[self.ap(i+1,j+1,k)] - prop[self.ap(i,j+1,k)]) / (self.centre_x[i+1]-self.centre_x[i]) \
-                    * ((x - origin_x) - self.centre_x[i]) + prop[self.ap(i,j+1,k)]
-            p_x3 = (prop[self.ap(i+1,j,k+1)] - prop[self.ap(i,j,k+1)]) / (self.centre_x[i+1]-self.centre_x[i]) \
-                    * ((x - origin_x) - self.centre_x[i]) + prop[self.ap(i,j,k+1)]
-            p_x4 = (prop[self.ap(i+1,j+1,k+1)] - prop[self.ap(i,j+1,k+1)]) / (self.centre_x[i+1]-self.centre_x[i]) \
-                    * ((x - origin_x) - self.centre_x[i]) + prop[self.ap(i,j+1,k+1)]
+            p_x1 = (prop[self.ap(i+1,j,k)] - prop[self.ap(i,j,k)]) / (geometry.centre_x[i+1]-geometry.centre_x[i]) \
+                    * ((x - origin_x) - geometry.centre_x[i]) + prop[self.ap(i,j,k)]
+            p_x2 = (prop[self.ap(i+1,j+1,k)] - prop[self.ap(i,j+1,k)]) / (geometry.centre_x[i+1]-geometry.centre_x[i]) \
+                    * ((x - origin_x) - geometry.centre_x[i]) + prop[self.ap(i,j+1,k)]
+            p_x3 = (prop[self.ap(i+1,j,k+1)] - prop[self.ap(i,j,k+1)]) / (geometry.centre_x[i+1]-geometry.centre_x[i]) \
+                    * ((x - origin_x) - geometry.centre_x[i]) + prop[self.ap(i,j,k+1)]
+            p_x4 = (prop[self.ap(i+1,j+1,k+1)] - prop[self.ap(i,j+1,k+1)]) / (geometry.centre_x[i+1]-geometry.centre_x[i]) \
+                    * ((x - origin_x) - geometry.centre_x[i]) + prop[self.ap(i,j+1,k+1)]
             # now interpolate between these values in y - direction (from plane to line)
-            p_y1 = (p_x2 - p_x1) / (self.centre_y[j+1] - self.centre_y[j]) \
-                    * ((y - origin_y) - self.centre_y[j]) + p_x1
-            p_y2 = (p_x4 - p_x3) / (self.centre_y[j+1] - self.centre_y[j]) \
-                    * ((y - origin_y) - self.centre_y[j]) + p_x3
+            p_y1 = (p_x2 - p_x1) / (geometry.centre_y[j+1] - geometry.centre_y[j]) \
+                    * ((y - origin_y) - geometry.centre_y[j]) + p_x1
+            p_y2 = (p_x4 - p_x3) / (geometry.centre_y[j+1] - geometry.centre_y[j]) \
+                    * ((y - origin_y) - geometry.centre_y[j]) + p_x3
             # now interpolate in z-direction (from line to point)
-            p_z = (p_y2 - p_y1) / (self.centre_z[k+1] - self.centre_z[k]) \
-                    * ((z - origin_z) - self.centre_z[k]) + p_y1
+            p_z = (p_y2 - p_y1) / (geometry.centre_z[k+1] - geometry.centre_z[k]) \
+                    * ((z - origin_z) - geometry.centre_z[k]) + p_y1
             
             return p_z
             
+    def get_interpolation_index(self, xs, ys, zs, **kwds):
+        """Determine the cell centres around points for a trilinear interpolation
+        
+        For each direction, the index of the cell centre before and after each
+        point and the distances to the lower centre and between the centres are
+        determined with a binary search on the cell centres of the grid geometry
+        (see self.get_values_xyz and ObservationStencil).
+        
+        **Arguments**:
+            - *xs, ys, zs* = 1-D arrays (or lists) of floats : positions of points
+        
+        **Optional Keywords**:
+            - *relative* = True/ False: relative to model origin (i.e.: not in real-world
+            coordinates).
+            - *edge* = 'clamp', 'extrapolate' : treatment of points in the edge cells
+            (default: 'clamp')
+        
+        **Returns**:
+            Tuple (index, valid) with index = [(i0, i1, dist, delta)] for x, y, z-direction
+            and valid = bool array : True if point is within the model range
+        """
+        edge = kwds.get('edge', 'clamp')
+        if edge not in ('clamp', 'extrapolate'):
+            raise ValueError("edge must be 'clamp' or 'extrapolate'")
+        if kwds.has_key('relative') and kwds['relative']:
+            # get value relative to model origin, not in real-world coordinates!
+            origin_x = 0
+            origin_y = 0
+            origin_z = 0
+        else:
+            try:
+                self.origin_z
+            except AttributeError:
+                self.get_model_origin()
+            origin_x = self.origin_x
+            origin_y = self.origin_y
+            origin_z = self.origin_z
+        geometry = self.get_geometry()
+        valid = np.ones(np.shape(np.atleast_1d(xs)), dtype=bool)
+        # lower cell index, upper cell index, distances to lower cell centre and
+        # between cell centres in each direction
+        index = []
+        for (coords, origin, boundaries, centres) in \
+                ((xs, origin_x, geometry.boundaries_x, geometry.centre_x),
+                 (ys, origin_y, geometry.boundaries_y, geometry.centre_y),
+                 (zs, origin_z, geometry.boundaries_z, geometry.centre_z)):
+            rel = np.atleast_1d(np.asarray(coords, dtype=np.float64)) - origin
+            with np.errstate(invalid='ignore'):
+                valid &= (rel >= boundaries[0]) & (rel <= boundaries[-1])
+            # array position corresponds to cell centre of cell before position
+            i0 = np.searchsorted(centres, rel, side='left') - 1
+            i0 = np.clip(i0, 0, max(len(centres) - 2, 0))
+            i1 = np.minimum(i0 + 1, len(centres) - 1)
+            if edge == 'clamp':
+                rel = np.clip(rel, centres[0], centres[-1])
+            dist = rel - centres[i0]
+            delta = centres[i1] - centres[i0]
+            # only one cell in this direction: no interpolation
+            dist[delta == 0] = 0.
+            delta[delta == 0] = 1.
+            index.append((i0, i1, dist, delta))
+        return (index, valid)
+
+    def get_values_xyz(self, property, xs, ys, zs, **kwds):
+        """Get the interpolated values of a property at many real-world positions
+        
+        Vectorized version of self.get_value_xyz: the values at all points are
+        interpolated at once with a trilinear interpolation between the surrounding
+        cell centres (with the same formulas as self.get_value_xyz). Points outside
+        of the model range are set to NaN.
+        
+        For points in the outer half of the edge cells of the model, i.e. outside of
+        the outermost cell centres, the values are either clamped to the value at the
+        cell centres or linearly extrapolated (keyword edge).
+        
+        **Arguments**:
+            - *property* = string : SHEMAT property variable name, e.g. TEMP for temperature,
+            or 1-D array with property values
+            - *xs, ys, zs* = 1-D arrays (or lists) of floats : positions of points
+        
+        **Optional Keywords**:
+            - *relative* = True/ False: relative to model origin (i.e.: not in real-world
+            coordinates).
+            - *edge* = 'clamp', 'extrapolate' : treatment of points in the edge cells
+            (default: 'clamp')
+            
+        **Returns**:
+            1-D numpy array with values at the points
+        """
+        if isinstance(property, str):
+            prop = self.get_array(property)
+        else:
+            prop = np.asarray(property, dtype=np.float64).ravel()
+        (index, valid) = self.get_interpolation_index(xs, ys, zs, **kwds)
+        ((i0, i1, dx, delx), (j0, j1, dy, dely), (k0, k1, dz, delz)) = index
+        geometry = self.get_geometry()
+        nx = geometry.idim
+        nxy = geometry.idim * geometry.jdim
+        # interpolate values in x-direction for all surrounding cell centers (from volumes to plane)
+        p_x1 = (prop[i1 + nx*j0 + nxy*k0] - prop[i0 + nx*j0 + nxy*k0]) / delx * dx + prop[i0 + nx*j0 + nxy*k0]
+        p_x2 = (prop[i1 + nx*j1 + nxy*k0] - prop[i0 + nx*j1 + nxy*k0]) / delx * dx + prop[i0 + nx*j1 + nxy*k0]
+        p_x3 = (prop[i1 + nx*j0 + nxy*k1] - prop[i0 + nx*j0 + nxy*k1]) / delx * dx + prop[i0 + nx*j0 + nxy*k1]
+        p_x4 = (prop[i1 + nx*j1 + nxy*k1] - prop[i0 + nx*j1 + nxy*k1]) / delx * dx + prop[i0 + nx*j1 + nxy*k1]
+        # now interpolate between these values in y - direction (from plane to line)
+        p_y1 = (p_x2 - p_x1) / dely * dy + p_x1
+        p_y2 = (p_x4 - p_x3) / dely * dy + p_x3
+        # now interpolate in z-direction (from line to point)
+        p_z = (p_y2 - p_y1) / delz * dz + p_y1
+        p_z[~valid] = np.nan
+        return p_z
+            
     def ap(self,i,j,k):
         """Shorthand for self.determine_array_pos(i,j,k)"""
         return self.determine_array_pos(i,j,k)
@@ -2074,10 +3195,7 @@ class Shemat_file:
             self.origin_x
         except AttributeError:
             self.get_model_origin()
-        try:
-            self.boundaries_x
-        except AttributeError:
-            self.get_cell_boundaries()
+        geometry = self.get_geometry()
         
         if kwds.has_key('relative') and kwds['relative']:
             # get value relative to model origin, not in real-world coordinates!
@@ -2088,16 +3206,16 @@ class Shemat_file:
             origin_y = self.origin_y
 
         # find position of x,y
-        for i,x_bound in enumerate(self.boundaries_x):
-            if (x - origin_x) > self.boundaries_x[-1]:
-                print "Position %s is out of bounds for direction x (max: %.2f)" % (x, self.boundaries_x[-1]+origin_x)
+        for i,x_bound in enumerate(geometry.boundaries_x):
+            if (x - origin_x) > geometry.boundaries_x[-1]:
+                print "Position %s is out of bounds for direction x (max: %.2f)" % (x, geometry.boundaries_x[-1]+origin_x)
                 raise ValueError
             if x_bound > (x - origin_x): 
                 x_pos = i-1 # array position corresponds to cell centre of cell before boundary!
                 break
-        for j,y_bound in enumerate(self.boundaries_y):
-            if (y - origin_y) > self.boundaries_y[-1]:
-                print "Position %s is out of bounds for direction y (max: %.2f)" % (y, self.boundaries_y[-1]+origin_y)
+        for j,y_bound in enumerate(geometry.boundaries_y):
+            if (y - origin_y) > geometry.boundaries_y[-1]:
+                print "Position %s is out of bounds for direction y (max: %.2f)" % (y, geometry.boundaries_y[-1]+origin_y)
                 raise ValueError
             if y_bound > (y - origin_y): 
                 y_pos = j-1 # array position corresponds to cell centre of cell before boundary!
@@ -2107,8 +3225,144 @@ class Shemat_file:
         property_xyz = self.get_array_as_xyz_structure(property)
         return property_xyz[x_pos][y_pos]
         
+    def get_path_points(self, path, spacing):
+        """Place points at a regular spacing along a polyline
+        
+        **Arguments**:
+            - *path* = list of (x,y) or (x,y,z) tuples (or array) : vertices of polyline
+            - *spacing* = float : distance between points along the path [m]
+        
+        **Returns**:
+            Tuple (distance, points): 1-D numpy array of distance along the path (from
+            first vertex) and array (n x 2 or n x 3) with coordinates of points; the
+            last vertex is always included
+        """
+        if spacing <= 0:
+            raise ValueError("spacing must be positive")
+        path = np.asarray(path, dtype=np.float64)
+        # distance along path at the vertices
+        dist_path = np.append(0, np.cumsum(np.sqrt(np.sum(np.diff(path, axis=0)**2, axis=1))))
+        distance = np.arange(0, dist_path[-1], spacing)
+        if len(distance) == 0 or distance[-1] < dist_path[-1]:
+            distance = np.append(distance, dist_path[-1])
+        points = np.array([np.interp(distance, dist_path, path[:,i])
+                           for i in range(path.shape[1])]).T
+        return (distance, points)
+
+    def get_section(self, property, start, end, resolution, **kwds):
+        """Get a vertical section of a property along an arbitrary line
+        
+        The section can be oriented in any direction and can also follow a polyline
+        (e.g. for fence diagrams, see keyword vertices). Points are placed along the
+        line at a regular spacing and the property is evaluated at the cell centre
+        elevations of all layers, either as value of the cell containing the point
+        or with a bilinear interpolation between the cell centres in the horizontal
+        plane. Points outside of the model are set to NaN.
+        
+        The section is returned as 2-D array with the layers in the rows (lowest layer
+        first) and the points along the line in the columns, and can be plotted, e.g.:
+        imshow(section, origin = 'lower', extent = (distance[0], distance[-1],
+        elevation[0], elevation[-1]))
+        
+        **Arguments**:
+            - *property* = string : SHEMAT property variable name, e.g. TEMP for temperature,
+            or 1-D array with property values
+            - *start* = (x,y) : start point of section
+            - *end* = (x,y) : end point of section
+            - *resolution* = float : distance between points along the section [m]
+        
+        **Optional Keywords**:
+            - *vertices* = list of (x,y) : additional points of a polyline between start and end
+            - *method* = 'bilinear', 'nearest' : interpolation method (default: 'bilinear')
+            - *relative* = True/ False: relative to model origin (i.e.: not in real-world
+            coordinates).
+            - *edge* = 'clamp', 'extrapolate' : treatment of points in the edge cells
+            for bilinear interpolation (default: 'clamp')
+        
+        **Returns**:
+            Tuple (section, distance, elevation): 2-D numpy array (kdim x n) with property
+            values, 1-D arrays of distance along the section and elevation of the layers
+        """
+        method = kwds.get('method', 'bilinear')
+        if method not in ('bilinear', 'nearest'):
+            raise ValueError("method must be 'bilinear' or 'nearest'")
+        geometry = self.get_geometry()
+        if kwds.has_key('relative') and kwds['relative']:
+            origin_z = 0
+        else:
+            try:
+                self.origin_z
+            except AttributeError:
+                self.get_model_origin()
+            origin_z = self.origin_z
+        path = [start] + list(kwds.get('vertices', [])) + [end]
+        (distance, points) = self.get_path_points(path, resolution)
+        (xs, ys) = points.T
+        # positions are determined in the horizontal plane, at the first cell centre in z
+        zs = np.ones_like(xs) * (geometry.centre_z[0] + origin_z)
+        if isinstance(property, str):
+            prop = self.get_array(property)
+        else:
+            prop = np.asarray(property, dtype=np.float64).ravel()
+        prop = prop.reshape(geometry.kdim, geometry.jdim, geometry.idim)
+        if method == 'nearest':
+            (pos, i, j, k, valid) = self.get_array_pos_xyz_many(xs, ys, zs, **kwds)
+            section = prop[:, np.where(valid, j, 0), np.where(valid, i, 0)]
+        else:
+            (index, valid) = self.get_interpolation_index(xs, ys, zs, **kwds)
+            ((i0, i1, dx, delx), (j0, j1, dy, dely), z_index) = index
+            # interpolate in x-direction, then in y-direction for all layers
+            p_x1 = (prop[:, j0, i1] - prop[:, j0, i0]) / delx * dx + prop[:, j0, i0]
+            p_x2 = (prop[:, j1, i1] - prop[:, j1, i0]) / delx * dx + prop[:, j1, i0]
+            section = (p_x2 - p_x1) / dely * dy + p_x1
+        section[:, ~valid] = np.nan
+        return (section, distance, geometry.centre_z + origin_z)
+
+    def sample_trajectory(self, property, path_xyz, spacing, **kwds):
+        """Sample a property along a (deviated) well trajectory
+        
+        The well path is defined as a polyline through a list of points. Points
+        are placed along the path at a regular spacing (measured along the path)
+        and the property is evaluated at all points at once, either as value of
+        the cell containing the point or with a trilinear interpolation between
+        cell centres (see self.get_values_xyz). Values of points outside of the
+        model are set to NaN.
+        
+        **Arguments**:
+            - *property* = string : SHEMAT property variable name, e.g. TEMP for temperature,
+            or 1-D array with property values
+            - *path_xyz* = list of (x,y,z) tuples (or array n x 3) : points of well path
+            - *spacing* = float : distance between sample points along the path [m]
+        
+        **Optional Keywords**:
+            - *method* = 'trilinear', 'nearest' : interpolation method (default: 'trilinear')
+            - *relative* = True/ False: relative to model origin (i.e.: not in real-world
+            coordinates).
+            - *edge* = 'clamp', 'extrapolate' : treatment of points in the edge cells
+            for trilinear interpolation (default: 'clamp')
+        
+        **Returns**:
+            Tuple (md, xs, ys, zs, values) of 1-D numpy arrays: measured depth along the
+            path (from first point), coordinates of sample points and property values
+        """
+        method = kwds.get('method', 'trilinear')
+        if method not in ('trilinear', 'nearest'):
+            raise ValueError("method must be 'trilinear' or 'nearest'")
+        (md, points) = self.get_path_points(np.reshape(path_xyz, (-1, 3)), spacing)
+        (xs, ys, zs) = points.T
+        if method == 'trilinear':
+            values = self.get_values_xyz(property, xs, ys, zs, **kwds)
+        else:
+            if isinstance(property, str):
+                prop = self.get_array(property)
+            else:
+                prop = np.asarray(property, dtype=np.float64).ravel()
+            (pos, i, j, k, valid) = self.get_array_pos_xyz_many(xs, ys, zs, **kwds)
+            values = np.where(valid, prop[np.where(valid, pos, 0)], np.nan)
+        return (md, xs, ys, zs, values)
+
     
-    def get_isohypse_data(self, property, value):
+    def get_isohypse_data(self, property, value, **kwds):
         """get an array of depth values for one property in the model, e.g.
         a map of depth to 100 C temperatures; The depth value is interpolated
         linearly between the two cell centres above and below the specified
@@ -2117,34 +3371,68 @@ class Shemat_file:
         a "2.5-D" type map, i.e. only the first point that reaches the
         value below the surface is considered! For a true 3-D contour plot, use
         a voxet export and VTK viewer (e.g. Mayavi)!
+        (see self.get_isohypse_maps for several values at once)
         property = SHEMAT variable name, e.g. "TEMP"
         value = float : value
-        returns 1-D array with the same structure as calculated mean temperatures,
+        optional keywords:
+        relative = True/False : elevation relative to model origin
+        as_array = True/False : return 2-D array[y,x] instead of 1-D list
+        returns 1-D list with the same structure as calculated mean temperatures,
         slice arrays (get_slice), etc. that can be plotted with
-        self.create_2D_property_plot or exported to an ASCII grid"""
-        # get property as an xyz-array
-        property_xyz = self.get_array_as_xyz_structure(property)
-        self.get_cell_centres()
-#        self.get_model_origin()
+        self.create_2D_property_plot or exported to an ASCII grid;
+        NaN at locations where the value is not reached"""
+        isohypse_xy = self.get_isohypse_maps(property, [value], **kwds)[0]
+        if kwds.has_key('as_array') and kwds['as_array']:
+            return isohypse_xy
+        return isohypse_xy.ravel().tolist()
+    
+    def get_isohypse_maps(self, property, values, **kwds):
+        """get maps of elevation values for several values of one property, e.g.
+        maps of the elevation of 100, 150 and 200 C temperatures
         
-        isohypse_xy = []
+        At each location (x,y), the first cell (from the base of the model) with
+        a property value below the specified value is determined and the elevation
+        is interpolated linearly between the centres of this cell and the cell
+        below (see self.get_isohypse_data). The maps for all values are determined
+        at once.
         
-        jdim = int(self.get("JDIM"))
-        idim = int(self.get("IDIM"))
+        **Arguments**:
+            - *property* = string : SHEMAT variable name, e.g. "TEMP"
+            - *values* = list of floats : property values
+        
+        **Optional keywords**:
+            - *relative* = True/False : elevation relative to model origin (default: False)
         
-        for y in range(jdim):
-            for x in range(idim):
-                for i,prop in enumerate(property_xyz[x][y]):
-                    if prop < value:
-                        # value between two centres, linear interpolation to approximate
-                        # position
-                        pos_ges = ((value - property_xyz[x][y][i]) / \
-                                  (property_xyz[x][y][i-1] - property_xyz[x][y][i]) * \
-                                  (self.centre_z[i-1] - self.centre_z[i])) + \
-                                  float(self.origin_z) + self.centre_z[i]
-                        isohypse_xy.append(pos_ges)
-                        break
-        return isohypse_xy
+        **Returns**:
+            3-D array[n_values, y, x] with elevation values; NaN at locations where
+            the value is not reached
+        """
+        geometry = self.get_geometry()
+        if kwds.has_key('relative') and kwds['relative']:
+            origin_z = 0
+        else:
+            try:
+                self.origin_z
+            except AttributeError:
+                self.get_model_origin()
+            origin_z = float(self.origin_z)
+        prop = self.get_array(property).reshape(geometry.kdim, geometry.jdim, geometry.idim)
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        # first cell in each column with a property value below the value
+        below = prop[np.newaxis, :, :, :] < values[:, np.newaxis, np.newaxis, np.newaxis]
+        k = np.argmax(below, axis=1)
+        crossed = np.any(below, axis=1) & (k > 0)
+        k = np.where(crossed, k, 1)
+        (j, i) = np.ogrid[0:geometry.jdim, 0:geometry.idim]
+        # value between two centres, linear interpolation to approximate position
+        prop_above = prop[k, j, i]
+        prop_below = prop[k - 1, j, i]
+        centre_z = geometry.centre_z
+        isohypses = (values[:, np.newaxis, np.newaxis] - prop_above) / \
+                    (prop_below - prop_above) * \
+                    (centre_z[k - 1] - centre_z[k]) + origin_z + centre_z[k]
+        isohypses[~crossed] = np.nan
+        return isohypses
                     
                 
                 
@@ -2205,10 +3493,11 @@ class Shemat_file:
         idim = int(self.get("IDIM"))
         jdim = int(self.get("JDIM"))
         kdim = int(self.get("KDIM"))
-        delx = self.get_array("DELX")
-        dely = self.get_array("DELY")
-        delz = self.get_array("DELZ")
-        (dx, dy, dz) = self.get_model_extent()
+        geometry = self.get_geometry()
+        delx = geometry.delx
+        dely = geometry.dely
+        delz = geometry.delz
+        (dx, dy, dz) = (geometry.extent_x, geometry.extent_y, geometry.extent_z)
        
         from numpy import array, reshape, rot90, transpose
         if kwds.has_key('direction'):
@@ -2601,25 +3890,13 @@ class Shemat_file:
             
     def update_del(self):
         """update delimitor arrays DELX, DELY, DELZ if boundaries changed
-        (e.g. with random change, ...)
+        (e.g. with random change, ...); the grid geometry (self.get_geometry)
+        is updated automatically
         """
-        # X
-        del_array = []
-        for i,step in enumerate(self.boundaries_x[1:]):
-            del_array.append(step-self.boundaries_x[i])
-        self.set_array("DELX", del_array)
-        # Y
-        del_array = []
-        for i,step in enumerate(self.boundaries_y[1:]):
-            del_array.append(step-self.boundaries_y[i])
-        self.set_array("DELY", del_array)
-        # Z
-        del_array = []
-        for i,step in enumerate(self.boundaries_z[1:]):
-            del_array.append(step-self.boundaries_z[i])
-        self.set_array("DELZ", del_array)
+        self.set_array("DELX", np.diff(self.boundaries_x))
+        self.set_array("DELY", np.diff(self.boundaries_y))
+        self.set_array("DELZ", np.diff(self.boundaries_z))
         
-
     def change_array_length(self, var_name, length):
         """Change the length of a variable array
         
@@ -2662,32 +3939,99 @@ class Shemat_file:
         """Compute the volume of each block in the model
         
         Function calculates the volume of each cell, can be important to process
-        results for cases of non-regular meshes. Results are stored in self.block_volume list
-        and returned as list; Enables, for example, the simple calculation of the total formation volume in combination
-        with self.formation_masks:
-        volume_3 = sum(self.formation_masks[3] * self.block_volume)
+        results for cases of non-regular meshes. Results are stored in self.block_volume
+        and returned as 1-D numpy array (in SHEMAT array order). The volumes are
+        computed as outer product of DELZ, DELY and DELX (see GridGeometry).
+        Enables, for example, the simple calculation of the total formation volume
+        in combination with self.formation_masks:
+        volume_3 = np.sum(self.formation_masks[3] * self.block_volume)
+        (see also self.formation_volumes)
         
         **Arguments**:
             none
         
         **Returns**:
-            - *block_volume* = list : list (1D) of block volumes
+            - *block_volume* = 1-D numpy array : block volumes
         """
-        idim = int(self.get("IDIM"))
-        jdim = int(self.get("JDIM"))
-        kdim = int(self.get("KDIM"))
-        delx = self.get_array("DELX")
-        dely = self.get_array("DELY")
-        delz = self.get_array("DELZ")
-        self.block_volume = [0 for x in range(idim * jdim * kdim)]
-        i = 0
-        for z in delz:
-            for y in dely:
-                for x in delx:
-                    self.block_volume[i] = x * y * z
-                    i += 1
+        # block volumes are computed with the grid geometry
+        self.block_volume = self.get_geometry().block_volume.ravel().copy()
         return self.block_volume
 
+    def formation_volumes(self):
+        """Compute the total volume of all formations in the model
+        
+        The volumes of all cells are summed up for each formation id in the
+        GEOLOGY array in one step (with np.bincount on the index of the formation
+        ids determined with np.unique, so that negative and large ids are possible).
+        
+        **Arguments**:
+            none
+        
+        **Returns**:
+            - *volumes* = dictionary : {formation_id : volume} for all formations
+            in the model
+        """
+        geology = self.get_array("GEOLOGY").astype(int)
+        block_volume = self.get_geometry().block_volume.ravel()
+        (ids, formation_index) = np.unique(geology, return_inverse=True)
+        volumes = np.bincount(formation_index, weights = block_volume)
+        return dict(zip(ids.tolist(), volumes.tolist()))
+
+    def formation_stats(self, property, weights='volume'):
+        """Compute statistics of a property for all formations in the model
+        
+        The statistics are determined for all formation ids in the GEOLOGY array
+        at once (with np.bincount and np.minimum.reduceat/ np.maximum.reduceat on
+        the cells sorted by formation id); the formation ids are mapped to an
+        index with np.unique, so that negative and large ids are possible.
+        
+        **Arguments**:
+            - *property* = string : SHEMAT property variable name, e.g. TEMP for temperature,
+            or 1-D array with property values
+        
+        **Optional Arguments**:
+            - *weights* = 'volume', None or 1-D array : weights for mean value and standard
+            deviation; 'volume': weighted by block volume, None: all cells equal
+            (default: 'volume')
+        
+        **Returns**:
+            - *stats* = dictionary : {formation_id : {'count', 'volume', 'mean', 'min',
+            'max', 'std'}} for all formations in the model
+        """
+        geology = self.get_array("GEOLOGY").astype(int)
+        if isinstance(property, str):
+            values = self.get_array(property)
+        else:
+            values = np.asarray(property, dtype=np.float64).ravel()
+        block_volume = self.get_geometry().block_volume.ravel()
+        if weights is None:
+            weights = np.ones(len(values))
+        elif isinstance(weights, str) and weights == 'volume':
+            weights = block_volume
+        else:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+        (ids, formation_index) = np.unique(geology, return_inverse=True)
+        count = np.bincount(formation_index)
+        volume = np.bincount(formation_index, weights = block_volume)
+        sum_weights = np.bincount(formation_index, weights = weights)
+        mean = np.bincount(formation_index, weights = weights * values) / sum_weights
+        variance = np.bincount(formation_index,
+                               weights = weights * (values - mean[formation_index])**2) / sum_weights
+        # minimum and maximum: sort values by formation id and reduce sections
+        order = np.argsort(formation_index, kind='mergesort')
+        starts = np.cumsum(count) - count
+        minimum = np.minimum.reduceat(values[order], starts)
+        maximum = np.maximum.reduceat(values[order], starts)
+        stats = {}
+        for n, f in enumerate(ids):
+            stats[int(f)] = {'count' : int(count[n]),
+                             'volume' : volume[n],
+                             'mean' : mean[n],
+                             'min' : minimum[n],
+                             'max' : maximum[n],
+                             'std' : np.sqrt(variance[n])}
+        return stats
+
     def update_model_from_voxet_file(self, voxet_file, **kwds):
         """update shemat geology array from voxet file, exported with
         GeoModeller (Model -> Export)
@@ -2777,7 +4121,7 @@ class Shemat_file:
         """Interpolate values on a regular grid with delauny triangulation
         
         The method can be used to interpolate values from a regular array structure
-        onto the structure of the SHEMAT grid,       
+        or scattered data points onto the structure of the SHEMAT grid,       
         for example to enable a lateral change of porosity values
         (can then be assigned to one formation) or to interpolate surface
         temperature variations (can then be used as initial temperature condition);
@@ -2791,48 +4135,30 @@ class Shemat_file:
 
         **Optional Keywords**:
             - *relative* = True/ False: relative to model origin (not in real-world coordinates)
+            - *method* = 'linear', 'nearest' : interpolation method (default: 'linear')
+        
+        The interpolation weights are stored (see XYGridInterpolator) and used again
+        for the next call with the same data points, e.g. to interpolate several
+        properties measured at the same stations.
             
         **Returns**:
-        1-D array with interpolated values (x-dominance 2-D grid)
+        1-D array with interpolated values (x-dominance 2-D grid), NaN outside of
+        the convex hull of the data points
         """
         try:
             self.origin_z
         except AttributeError:
             self.get_model_origin()
+        # interpolation weights are only determined again if data points or grid changed
         try:
-            self.extent_x
+            interpolator = self.xy_grid_interpolator
         except AttributeError:
-            self.get_model_extent()
-            
-        if kwds.has_key('relative') and kwds['relative']:
-            # get value relative to model origin, not in real-world coordinates!
-            origin_x = 0
-            origin_y = 0
-        else:
-            origin_x = self.origin_x
-            origin_y = self.origin_y
-        
-        import numpy as np
-        import matplotlib.mlab as mlab
-
-        # generate regular grid to interpolate data
-        xmin, xmax = origin_x, origin_x + self.extent_x
-        ymin, ymax = origin_y, origin_y + self.extent_y
-        xi = np.linspace(xmin, xmax, self.idim)
-        yi = np.linspace(ymin, ymax, self.jdim)
-        xi, yi = np.meshgrid(xi, yi)
-        
-        # Interpolate with delauny triangulation
-        zi = mlab.griddata(x_coords,y_coords,z_values,xi,yi)
-        # plot results: can be used to test method
-#        import matplotlib.pyplot as plt
-#        plt.figure()
-#        plt.pcolormesh(xi,yi,zi)
-#        plt.axis([xmin, xmax, ymin, ymax])
-#        plt.colorbar()
-#        plt.show()
-        from scipy import ravel
-        zi = ravel(zi)
+            interpolator = None
+        if interpolator is None or \
+                not interpolator.is_valid_for(self, x_coords, y_coords, **kwds):
+            interpolator = XYGridInterpolator(self, x_coords, y_coords, **kwds)
+            self.xy_grid_interpolator = interpolator
+        zi = interpolator.interpolate(z_values)
         return zi
         
     def assign_xy_values_from_grid(self, grid_xy, property, **kwds):
@@ -3005,10 +4331,7 @@ class Shemat_file:
             self.origin_z
         except AttributeError:
             self.get_model_origin()
-        try:
-            self.centre_z
-        except AttributeError:
-            self.get_cell_centres()
+        geometry = self.get_geometry()
         
         if kwds.has_key('relative') and kwds['relative']:
             # get value relative to model origin, not in real-world coordinates!
@@ -3018,7 +4341,7 @@ class Shemat_file:
 
         temp_xyz = self.get_array_as_xyz_structure("# TEMP")
 
-        for k,z_val in enumerate(self.centre_z):
+        for k,z_val in enumerate(geometry.centre_z):
             # check for minimal altitude contidtion
             z_real = z_val + origin_z
             print z_real
@@ -3111,7 +4434,7 @@ class Shemat_file:
         returns ASCII grid object
         Attention: works only for regular (x,y) grids (due to limitations of
         ASCII grid file definition);
-        property_xy = list : (1-D) list with grid values, e.g. created
+        property_xy = list : (1-D) list or 2-D array with grid values, e.g. created
                             with self.calc_mean_formation_value
         ascii_filename = string : filename of ASCII grid file (without path)
         optional keywords:
@@ -3121,7 +4444,7 @@ class Shemat_file:
         
         # write properties to ASCII grid
         A2 = ASCII_File()
-        A2.convert_SHEMAT_results_to_header(self, property_xy)
+        A2.convert_SHEMAT_results_to_header(self, np.ravel(property_xy))
         return A2
 
     def export_to_voxet_object(self, property):
@@ -0,0 +1,120 @@
+'''Benchmark of variable access in a large SHEMAT model
+
+A model with 100 x 100 x 100 = 10^6 cells is created with PySHEMAT.create_empty_model
+and read in again. The script then measures the time required for typical
+variable access operations. The numbers are printed to screen and can be used to
+compare different versions of PySHEMAT.
+
+Note: the model file shemat_benchmark.nml is created in the current directory!
+'''
+
+import PySHEMAT as PS
+from time import time
+from numpy import random
+
+n = 100 # number of cells in each direction
+
+# create model with 10^6 cells and random temperatures (as in a result file)
+start = time()
+S1 = PS.create_empty_model(dx = n * [10.], dy = n * [10.], dz = n * [10.],
+                           nml_filename = 'shemat_benchmark')
+S1.set_array("# TEMP", 10. + 90. * random.rand(n**3))
+S1.write_file('shemat_benchmark')
+print "Create model with %d cells:\t\t %8.3f s" % (n**3, time() - start)
+
+# read model from file
+start = time()
+S1 = PS.Shemat_file('shemat_benchmark.nml')
+print "Read model:\t\t\t\t %8.3f s" % (time() - start)
+
+# scalar variables: direct access through index of variable positions
+n_access = 1000
+start = time()
+for i in range(n_access):
+    S1.get("IDIM")
+    S1.get("JDIM")
+    S1.get("KDIM")
+print "Access IDIM, JDIM, KDIM (%d times):\t %8.3f s" % (n_access, time() - start)
+
+# for comparison: linear scan through all lines of the file, as required
+# for variables defined at the end of the file
+start = time()
+for i in range(n_access):
+    for l in S1.filelines:
+        if "AREAKT" in l: break
+print "Linear scan for AREAKT (%d times):\t %8.3f s" % (n_access, time() - start)
+
+start = time()
+for i in range(n_access):
+    S1.get("AREAKT")
+print "Access AREAKT (%d times):\t\t %8.3f s" % (n_access, time() - start)
+
+# array variables
+start = time()
+temp = S1.get_array("# TEMP")
+print "Read TEMP array:\t\t\t %8.3f s" % (time() - start)
+
+start = time()
+S1.set_array("# TEMP", temp)
+print "Set TEMP array:\t\t\t\t %8.3f s" % (time() - start)
+
+# typical analysis method
+start = time()
+S1.calc_mean_formation_value(1, "# TEMP")
+print "Mean formation temperature:\t\t %8.3f s" % (time() - start)
+
+# cached arrays: repeated access and writing of changed variables only
+start = time()
+for i in range(10):
+    S1.get_np_array("# TEMP")
+print "Access TEMP as 3-D array (10 times):\t %8.3f s" % (time() - start)
+
+start = time()
+S1.write_file('shemat_benchmark')
+print "Write model (TEMP changed):\t\t %8.3f s" % (time() - start)
+
+# binary cache file: first access creates the cache file, second loads it
+start = time()
+S1 = PS.Shemat_file('shemat_benchmark.nml', cache = True)
+print "Read model and create cache file:\t %8.3f s" % (time() - start)
+
+start = time()
+S1 = PS.Shemat_file('shemat_benchmark.nml', cache = True)
+S1.get_array("# TEMP")
+print "Read model from cache, get TEMP:\t %8.3f s" % (time() - start)
+
+# lazy reading: only the accessed variables are read from the file
+start = time()
+S1 = PS.Shemat_file('shemat_benchmark.nml', lazy = True)
+print "Open model (lazy):\t\t\t %8.3f s" % (time() - start)
+
+start = time()
+S1.get_array("# TEMP")
+print "Read TEMP array (lazy):\t\t\t %8.3f s" % (time() - start)
+
+# spatial queries: locate 50,000 points (e.g. temperature measurements in wells)
+n_points = 50000
+xs = 1000. * random.rand(n_points)
+ys = 1000. * random.rand(n_points)
+zs = 1000. * random.rand(n_points)
+start = time()
+for i in range(1000):
+    S1.get_array_pos_xyz(xs[i], ys[i], zs[i])
+print "Locate 1,000 points (single):\t\t %8.3f s" % (time() - start)
+
+start = time()
+(pos, i, j, k, valid) = S1.get_array_pos_xyz_many(xs, ys, zs)
+print "Locate %d points (vectorized):\t %8.3f s" % (n_points, time() - start)
+
+# observation stencil: interpolate the same points in an ensemble of results
+n_members = 20
+temps = [10. + 90. * random.rand(n**3) for m in range(n_members)]
+start = time()
+for t in temps:
+    S1.get_values_xyz(t, xs, ys, zs)
+print "Interpolate %d points, %d members:\t %8.3f s" % (n_points, n_members, time() - start)
+
+start = time()
+stencil = PS.ObservationStencil(S1, xs, ys, zs)
+stencil.apply(temps)
+print "Same with ObservationStencil:\t\t %8.3f s" % (time() - start)
@@ -0,0 +1,24 @@
+'''Benchmark of the output formats of PySHEMAT arrays
+
+An array with 10^6 random values is encoded in the compressed SHEMAT format
+with all available float types (see Shemat_file.set_float_format). The time,
+throughput and size of the encoded string are printed to screen, together
+with the maximum relative error of the values read back from the string.
+'''
+
+import PySHEMAT as PS
+import numpy as np
+from time import time
+
+n = 10**6
+values = 10. + 90. * np.random.rand(n)
+
+S1 = PS.Shemat_file()
+print "%-10s %10s %12s %10s %12s" % ("float_type", "time [s]", "values/s", "size [MB]", "max rel err")
+for float_type in ['normal', 'high_res', 'lossless', 4, 8, 17]:
+    start = time()
+    encoded = S1.encode_array("TEMP", values, float_type = float_type)
+    t = time() - start
+    decoded = S1.decode_array_string(encoded, "TEMP")
+    err = np.max(np.abs(decoded - values) / np.abs(values))
+    print "%-10s %10.3f %12.0f %10.2f %12.2e" % (float_type, t, n / t, len(encoded) / 1e6, err)
@@ -0,0 +1,58 @@
+"""Test of the vectorized determination of array positions
+
+The array positions of random points and of points on the cell boundaries in
+the example file temp_gradient.nlo are determined at once with
+Shemat_file.get_array_pos_xyz_many and compared with Shemat_file.get_array_pos_xyz
+(loop over the cell boundaries for each point), for the regular grid of the file
+and for an irregular grid (changed DELX and DELZ). Points outside of the model
+have to be marked as not valid (position -1).
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+np.random.seed(1)
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(1000., 2000., -500.)
+for grid in ("regular", "irregular"):
+    if grid == "irregular":
+        S1.set_array("DELX", np.linspace(50., 150., S1.idim), float_type = 'lossless')
+        S1.set_array("DELZ", np.linspace(20., 80., S1.kdim), float_type = 'lossless')
+    geometry = S1.get_geometry()
+    n = 200
+    xs = S1.origin_x + np.random.uniform(0, geometry.extent_x, n)
+    ys = S1.origin_y + np.random.uniform(0, geometry.extent_y, n)
+    zs = S1.origin_z + np.random.uniform(0, geometry.extent_z, n)
+    # points on inner cell boundaries
+    xs[:10] = S1.origin_x + geometry.boundaries_x[1:11]
+    zs[10:20] = S1.origin_z + geometry.boundaries_z[1:11]
+    (pos, i, j, k, valid) = S1.get_array_pos_xyz_many(xs, ys, zs)
+    ref_pos = [S1.get_array_pos_xyz(x, y, z) for (x, y, z) in zip(xs, ys, zs)]
+    ref_ijk = [S1.get_array_pos_xyz(x, y, z, three_d = True) for (x, y, z) in zip(xs, ys, zs)]
+    ok = valid.all() and np.array_equal(pos, ref_pos) and \
+         np.array_equal(np.column_stack((i, j, k)), ref_ijk)
+    all_ok = all_ok and ok
+    print "%-36s %s" % ("points in model (%s)" % grid, ok and "OK" or "FAILED")
+
+    # relative coordinates
+    (pos_rel, i, j, k, valid) = S1.get_array_pos_xyz_many(xs - S1.origin_x, ys - S1.origin_y,
+                                                          zs - S1.origin_z, relative = True)
+    ok = valid.all() and np.array_equal(pos_rel, pos)
+    all_ok = all_ok and ok
+    print "%-36s %s" % ("relative coordinates (%s)" % grid, ok and "OK" or "FAILED")
+
+    # points outside of the model
+    xs_out = [S1.origin_x - 1., xs[0], xs[0], S1.origin_x + geometry.extent_x + 1.]
+    ys_out = [ys[0], ys[0], S1.origin_y - 1., ys[0]]
+    zs_out = [zs[0], S1.origin_z + geometry.extent_z + 1., zs[0], zs[0]]
+    (pos, i, j, k, valid) = S1.get_array_pos_xyz_many(xs_out, ys_out, zs_out)
+    ok = not valid.any() and (pos == -1).all() and (i == -1).all()
+    all_ok = all_ok and ok
+    print "%-36s %s" % ("points outside of model (%s)" % grid, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -0,0 +1,57 @@
+"""Test of the export of calculated 2-D maps to ASCII grid files
+
+Mean formation temperatures of the example file conv_ex_1.nml are calculated
+(see Shemat_file.calc_mean_formation_value) as 1-D list (default) and as 2-D
+array (as_array = True) and exported with Shemat_file.grid_2D_to_ASCII_grid and
+PyASCII.ASCII_File.import_SHEMAT_2D_array. The ASCII grid data of both forms have
+to be the same, with the first row of the grid corresponding to the most
+Northern row of the model, and the written ASCII grid files have to be identical.
+
+Note: the test files test_ascii_export*.txt are created in the current directory!
+"""
+
+import PySHEMAT as PS
+from PyASCII import ASCII_File
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "conv_ex_1.nml")
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+form_id = S1.get_array("GEOLOGY")[0]
+temperature_xy = S1.calc_mean_formation_value(form_id, "# TEMP")
+temperature_2D = S1.calc_mean_formation_value(form_id, "# TEMP", as_array = True)
+ok = isinstance(temperature_xy, list) and \
+     temperature_2D.shape == (S1.jdim, S1.idim) and \
+     np.array_equal(np.ravel(temperature_2D), temperature_xy)
+all_ok = all_ok and ok
+print "%-24s %s" % ("list and array", ok and "OK" or "FAILED")
+
+# export with grid_2D_to_ASCII_grid
+A1 = S1.grid_2D_to_ASCII_grid(temperature_xy)
+A2 = S1.grid_2D_to_ASCII_grid(temperature_2D)
+ok = A1.data_array == A2.data_array and \
+     A1.data_array == temperature_2D[::-1].tolist()
+all_ok = all_ok and ok
+print "%-24s %s" % ("grid_2D_to_ASCII_grid", ok and "OK" or "FAILED")
+
+# export with import_SHEMAT_2D_array, with nodata values
+for (name, property_xy) in (("list", temperature_xy), ("array", temperature_2D)):
+    A = ASCII_File()
+    A.import_SHEMAT_2D_array(S1, property_xy,
+                             set_nodata_value = True,
+                             nodata_range_min = -0.0001,
+                             nodata_range_max = 0.0001,
+                             filename = 'test_ascii_export_%s' % name)
+    A.write_file()
+expected = np.where(np.abs(temperature_2D) < 0.0001, -9999, temperature_2D)
+ok = open("test_ascii_export_list.txt").read() == \
+     open("test_ascii_export_array.txt").read() and \
+     A.data_array == expected[::-1].tolist() and \
+     np.array_equal(np.ravel(temperature_2D), temperature_xy)
+all_ok = all_ok and ok
+print "%-24s %s" % ("import_SHEMAT_2D_array", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
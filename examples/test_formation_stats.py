@@ -0,0 +1,76 @@
+"""Test of the statistics of properties for all formations
+
+The statistics of the temperatures in all formations of the example file
+temp_gradient.nlo are determined with Shemat_file.formation_stats and compared
+with a loop over the formation masks (see Shemat_file.create_formation_masks) and
+block volumes, as in previous versions of PySHEMAT, for volume weights, no
+weights and an irregular grid. The formation volumes (Shemat_file.formation_volumes)
+are compared in the same way, also for negative and large formation ids.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+def stats_loop(S1, values, weighted):
+    """statistics for each formation with formation masks and block volumes"""
+    masks = S1.create_formation_masks()
+    block_volume = S1.calc_block_volume()
+    stats = {}
+    for f in S1.formation_list:
+        cell_values = []
+        cell_volumes = []
+        for i in range(len(values)):
+            if masks[f][i] == 1:
+                cell_values.append(values[i])
+                cell_volumes.append(block_volume[i])
+        if weighted:
+            cell_weights = cell_volumes
+        else:
+            cell_weights = [1. for v in cell_values]
+        mean = sum([w * v for (w, v) in zip(cell_weights, cell_values)]) / sum(cell_weights)
+        variance = sum([w * (v - mean)**2 for (w, v) in zip(cell_weights, cell_values)]) / \
+                   sum(cell_weights)
+        stats[f] = {'count' : len(cell_values), 'volume' : sum(cell_volumes),
+                    'mean' : mean, 'min' : min(cell_values), 'max' : max(cell_values),
+                    'std' : np.sqrt(variance)}
+    return stats
+
+def compare(stats, ref):
+    if sorted(stats.keys()) != sorted(ref.keys()):
+        return False
+    for f in ref.keys():
+        for key in ref[f].keys():
+            if not np.allclose(stats[f][key], ref[f][key], rtol = 1e-10, atol = 0):
+                return False
+    return True
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+temp = S1.get_array("# TEMP")
+for grid in ("regular", "irregular"):
+    if grid == "irregular":
+        S1.set_array("DELX", np.linspace(50., 150., S1.idim), float_type = 'lossless')
+        S1.set_array("DELZ", np.linspace(20., 80., S1.kdim), float_type = 'lossless')
+    ok = compare(S1.formation_stats("# TEMP"), stats_loop(S1, temp, True)) and \
+         compare(S1.formation_stats(temp, weights = None), stats_loop(S1, temp, False))
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("formation_stats (%s)" % grid, ok and "OK" or "FAILED")
+    volumes = dict([(f, s['volume']) for (f, s) in stats_loop(S1, temp, True).items()])
+    ok = compare(dict([(f, {'volume' : v}) for (f, v) in S1.formation_volumes().items()]),
+                 dict([(f, {'volume' : v}) for (f, v) in volumes.items()]))
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("formation_volumes (%s)" % grid, ok and "OK" or "FAILED")
+
+# negative and large formation ids
+geology = S1.get_array("GEOLOGY")
+S1.set_array("GEOLOGY", np.where(geology == 1, -5, geology * 1000000))
+ok = compare(S1.formation_stats("# TEMP"), stats_loop(S1, temp, True)) and \
+     sorted(S1.formation_volumes().keys()) == [-5, 2000000, 3000000]
+all_ok = all_ok and ok
+print "%-34s %s" % ("negative and large ids", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -0,0 +1,53 @@
+"""Test of vertical sections along arbitrary lines
+
+Vertical temperature sections along a diagonal line and along a polyline in the
+example file temp_gradient.nlo are determined with Shemat_file.get_section and
+compared with the values of Shemat_file.get_value_xyz at the cell centre
+elevations (method 'bilinear') and with the cells determined with
+Shemat_file.get_array_pos_xyz (method 'nearest') at each point and layer.
+Points outside of the model have to be NaN.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(0, 0, 0)
+geometry = S1.get_geometry()
+temp = S1.get_array("# TEMP")
+
+for (name, start, end, vertices) in (("diagonal line", (120., 130.), (2810., 2270.), []),
+                                     ("polyline", (120., 130.), (2810., 2270.),
+                                      [(1500., 2600.), (2000., 300.)])):
+    (section, distance, elevation) = S1.get_section("# TEMP", start, end, 50.,
+                                                    vertices = vertices)
+    (md, points) = S1.get_path_points([start] + vertices + [end], 50.)
+    ok = section.shape == (S1.kdim, len(distance)) and \
+         np.allclose(distance, md) and np.allclose(elevation, geometry.centre_z)
+    ref = [[S1.get_value_xyz("# TEMP", x, y, z) for (x, y) in points] for z in elevation]
+    ok = ok and np.allclose(section, ref, rtol = 1e-12, atol = 0)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("bilinear (%s)" % name, ok and "OK" or "FAILED")
+
+    (section, distance, elevation) = S1.get_section("# TEMP", start, end, 50.,
+                                                    vertices = vertices, method = 'nearest')
+    ref = [[temp[S1.get_array_pos_xyz(x, y, z)] for (x, y) in points] for z in elevation]
+    ok = np.array_equal(section, ref)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("nearest (%s)" % name, ok and "OK" or "FAILED")
+
+# line leaving the model
+(section, distance, elevation) = S1.get_section("# TEMP", (1500., 1500.), (3500., 1500.), 50.)
+(md, points) = S1.get_path_points([(1500., 1500.), (3500., 1500.)], 50.)
+inside = points[:, 0] <= geometry.boundaries_x[-1]
+ok = not np.isnan(section[:, inside]).any() and np.isnan(section[:, ~inside]).all() and \
+     (~inside).any()
+all_ok = all_ok and ok
+print "%-34s %s" % ("points outside of model", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
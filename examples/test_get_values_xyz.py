@@ -0,0 +1,66 @@
+"""Test of the vectorized trilinear interpolation at many points
+
+The temperatures of the example file temp_gradient.nlo are interpolated at random
+points with Shemat_file.get_values_xyz and compared with the values of
+Shemat_file.get_value_xyz at each single point, for the regular grid of the file
+and for an irregular grid (changed DELX and DELZ). In the outer half of the edge
+cells, the values are compared with the value at the outermost cell centre (edge
+= 'clamp') and with the linear extrapolation of two values of get_value_xyz in
+the edge cell (edge = 'extrapolate'). Points outside of the model have to be NaN.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+np.random.seed(1)
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(0, 0, 0)
+for grid in ("regular", "irregular"):
+    if grid == "irregular":
+        S1.set_array("DELX", np.linspace(50., 150., S1.idim), float_type = 'lossless')
+        S1.set_array("DELZ", np.linspace(20., 80., S1.kdim), float_type = 'lossless')
+    geometry = S1.get_geometry()
+    # interior points: between the outermost cell centres
+    n = 100
+    xs = np.random.uniform(geometry.centre_x[0], geometry.centre_x[-1], n)
+    ys = np.random.uniform(geometry.centre_y[0], geometry.centre_y[-1], n)
+    zs = np.random.uniform(geometry.centre_z[0], geometry.centre_z[-1], n)
+    ref = np.array([S1.get_value_xyz("# TEMP", x, y, z) for (x, y, z) in zip(xs, ys, zs)])
+    ok = True
+    for edge in ('clamp', 'extrapolate'):
+        values = S1.get_values_xyz("# TEMP", xs, ys, zs, edge = edge)
+        ok = ok and np.allclose(values, ref, rtol = 1e-12, atol = 0)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("interior points (%s)" % grid, ok and "OK" or "FAILED")
+
+    # points in the outer half of the lower and upper edge cells in x-direction
+    centres = geometry.centre_x
+    boundaries = geometry.boundaries_x
+    ok = True
+    for (centre, h, boundary) in ((centres[0], (centres[1] - centres[0]) / 4., boundaries[0]),
+                                  (centres[-1], (centres[-2] - centres[-1]) / 4., boundaries[-1])):
+        xs_edge = centre + np.random.uniform(0, 1, n) * (boundary - centre)
+        # two points in the edge cell (inside the outermost cell centres)
+        f_a = np.array([S1.get_value_xyz("# TEMP", centre + h, y, z) for (y, z) in zip(ys, zs)])
+        f_b = np.array([S1.get_value_xyz("# TEMP", centre + 2 * h, y, z) for (y, z) in zip(ys, zs)])
+        clamped = 2 * f_a - f_b
+        extrapolated = f_a + (f_b - f_a) / h * (xs_edge - (centre + h))
+        ok = ok and \
+             np.allclose(S1.get_values_xyz("# TEMP", xs_edge, ys, zs, edge = 'clamp'), clamped) and \
+             np.allclose(S1.get_values_xyz("# TEMP", xs_edge, ys, zs, edge = 'extrapolate'), extrapolated)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("edge cells (%s)" % grid, ok and "OK" or "FAILED")
+
+    # points outside of the model
+    values = S1.get_values_xyz("# TEMP", [-1., boundaries[-1] + 1., xs[0]],
+                               [ys[0], ys[0], ys[0]], [zs[0], zs[0], geometry.boundaries_z[-1] + 1.])
+    ok = np.isnan(values).all()
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("outside of model (%s)" % grid, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
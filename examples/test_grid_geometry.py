@@ -0,0 +1,79 @@
+"""Test of the cached grid geometry (PySHEMAT.GridGeometry)
+
+The cell boundaries, cell centres, model extent and block volumes of the example
+file temp_gradient.nlo are determined with Shemat_file.get_geometry and compared
+with the per-cell loops of previous versions of PySHEMAT, for the regular grid of
+the file and for an irregular grid (changed DELX, DELY and DELZ). The cached
+geometry has to be updated when the cell widths are changed.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+def boundaries_loop(steps):
+    """cell boundaries, as in previous versions of get_cell_boundaries"""
+    b = []
+    laststep = 0
+    b.append(laststep)
+    for step in steps:
+        b.append(laststep+step)
+        laststep += step
+    return b
+
+def centres_loop(boundaries):
+    """cell centres, as in previous versions of get_cell_centres"""
+    centres = []
+    for i in range(len(boundaries[:-1])):
+        centres.append((boundaries[i+1]-boundaries[i])/2.+boundaries[i])
+    return centres
+
+def block_volume_loop(delx, dely, delz):
+    """block volumes, as in previous versions of calc_block_volume"""
+    block_volume = []
+    for z in delz:
+        for y in dely:
+            for x in delx:
+                block_volume.append(x * y * z)
+    return block_volume
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+for grid in ("regular", "irregular"):
+    if grid == "irregular":
+        geometry_before = S1.get_geometry()
+        S1.set_array("DELX", np.linspace(50., 150., S1.idim), float_type = 'lossless')
+        S1.set_array("DELY", np.linspace(120., 80., S1.jdim), float_type = 'lossless')
+        S1.set_array("DELZ", np.linspace(20., 80., S1.kdim), float_type = 'lossless')
+        ok = S1.get_geometry() is not geometry_before
+        all_ok = all_ok and ok
+        print "%-34s %s" % ("geometry updated", ok and "OK" or "FAILED")
+    geometry = S1.get_geometry()
+    (delx, dely, delz) = (S1.get_array("DELX"), S1.get_array("DELY"), S1.get_array("DELZ"))
+    ok = True
+    for (steps, boundaries, centres, extent) in \
+            ((delx, geometry.boundaries_x, geometry.centre_x, geometry.extent_x),
+             (dely, geometry.boundaries_y, geometry.centre_y, geometry.extent_y),
+             (delz, geometry.boundaries_z, geometry.centre_z, geometry.extent_z)):
+        b = boundaries_loop(steps)
+        ok = ok and np.allclose(boundaries, b) and \
+             np.allclose(centres, centres_loop(b)) and \
+             np.allclose(extent, max(b) - min(b))
+    # object variables of get_cell_boundaries and get_cell_centres
+    S1.get_cell_centres()
+    ok = ok and np.allclose(S1.boundaries_z, boundaries_loop(delz)) and \
+         np.allclose(S1.centre_x, centres_loop(boundaries_loop(delx)))
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("boundaries and centres (%s)" % grid, ok and "OK" or "FAILED")
+
+    block_volume = block_volume_loop(delx, dely, delz)
+    ok = geometry.block_volume.shape == (S1.kdim, S1.jdim, S1.idim) and \
+         np.allclose(geometry.block_volume.ravel(), block_volume) and \
+         np.allclose(S1.calc_block_volume(), block_volume)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("block volumes (%s)" % grid, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -0,0 +1,68 @@
+"""Test of isohypse maps, e.g. maps of the elevation of 100 C temperatures
+
+Maps of the elevation of several temperatures in the example file
+temp_gradient.nlo are determined with Shemat_file.get_isohypse_maps and
+Shemat_file.get_isohypse_data and compared with the loop over all columns of
+previous versions of get_isohypse_data: the elevation is interpolated linearly
+between the first cell (from the base) with a temperature below the value and
+the cell below. Locations where the value is not reached (or already in the
+lowest cell) have to be NaN.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+def isohypse_loop(S1, property, value, origin_z):
+    """isohypse map with a loop over all columns, as in previous versions"""
+    property_xyz = S1.get_array_as_xyz_structure(property)
+    centre_z = S1.get_geometry().centre_z
+    isohypse_xy = []
+    for y in range(S1.jdim):
+        for x in range(S1.idim):
+            pos_ges = np.nan
+            for i, prop in enumerate(property_xyz[x][y]):
+                if prop < value:
+                    if i > 0:
+                        pos_ges = ((value - property_xyz[x][y][i]) / \
+                                   (property_xyz[x][y][i-1] - property_xyz[x][y][i]) * \
+                                   (centre_z[i-1] - centre_z[i])) + \
+                                   origin_z + centre_z[i]
+                    break
+            isohypse_xy.append(pos_ges)
+    return isohypse_xy
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(0, 0, -2000.)
+temp = S1.get_array("# TEMP")
+values = np.linspace(temp.min(), temp.max(), 7)[1:-1]
+
+for relative in (False, True):
+    if relative:
+        origin_z = 0.
+    else:
+        origin_z = -2000.
+    maps = S1.get_isohypse_maps("# TEMP", values, relative = relative)
+    ok = maps.shape == (len(values), S1.jdim, S1.idim)
+    for (n, value) in enumerate(values):
+        ref = isohypse_loop(S1, "# TEMP", value, origin_z)
+        isohypse_xy = S1.get_isohypse_data("# TEMP", value, relative = relative)
+        isohypse_array = S1.get_isohypse_data("# TEMP", value, relative = relative,
+                                              as_array = True)
+        ok = ok and type(isohypse_xy) == list and \
+             np.allclose(isohypse_xy, ref, rtol = 1e-12, atol = 0, equal_nan = True) and \
+             np.allclose(isohypse_array.ravel(), ref, rtol = 1e-12, atol = 0, equal_nan = True) and \
+             np.allclose(maps[n].ravel(), ref, rtol = 1e-12, atol = 0, equal_nan = True)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("isohypse maps (relative=%s)" % relative, ok and "OK" or "FAILED")
+
+# values not reached in the model: above the top or already in the lowest cell
+ok = np.isnan(S1.get_isohypse_maps("# TEMP", [temp.min() - 1., temp.max() + 1.])).all()
+all_ok = all_ok and ok
+print "%-34s %s" % ("values not reached", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
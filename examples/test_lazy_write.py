@@ -0,0 +1,47 @@
+"""Test of saving a lazily opened SHEMAT file in place
+
+The example file conv_ex_1.nml is copied to test_lazy_write.nml, opened lazily
+(see Shemat_file.open_lazy) and written to the same file, without changes and
+with a changed array. The written file has to be complete (identical to the
+original file without changes) and the changed values have to be read back
+correctly; the object has to remain usable after the file was replaced.
+
+Note: the test file test_lazy_write.nml is created in the current directory!
+"""
+
+import PySHEMAT as PS
+import numpy as np
+import shutil
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "conv_ex_1.nml")
+test_file = "test_lazy_write.nml"
+shutil.copy(example_file, test_file)
+
+all_ok = True
+
+# save without changes
+S1 = PS.Shemat_file(test_file, lazy = True)
+S1.write_file(test_file)
+ok = open(test_file).read() == open(example_file).read()
+all_ok = all_ok and ok
+print "%-24s %s" % ("unchanged", ok and "OK" or "FAILED")
+
+# save with changed array, twice with the same object
+S1 = PS.Shemat_file(test_file, lazy = True)
+n = S1.idim * S1.jdim * S1.kdim
+temp = 10. + 0.01 * np.arange(n)
+S1.set_array("# TEMP", temp, float_type = 'lossless')
+S1.write_file(test_file)
+S1.set_array("# TEMP", temp + 1., float_type = 'lossless')
+S1.write_file(test_file)
+S2 = PS.Shemat_file(test_file)
+R = PS.Shemat_file(example_file)
+ok = np.array_equal(S2.get_array("# TEMP"), temp + 1.) and \
+     np.array_equal(S2.get_array("GEOLOGY"), R.get_array("GEOLOGY")) and \
+     S2.get("AREAKT") == R.get("AREAKT") and \
+     np.array_equal(S1.get_array("GEOLOGY"), R.get_array("GEOLOGY"))
+all_ok = all_ok and ok
+print "%-24s %s" % ("changed TEMP", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
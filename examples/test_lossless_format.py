@@ -0,0 +1,42 @@
+"""Test of the lossless output format of PySHEMAT arrays
+
+Arrays are set with float_type = 'lossless' (see Shemat_file.set_array and
+Shemat_file.set_float_format), written to a SHEMAT file and read in again. The
+values read from the file have to be identical to the original values, i.e.
+get_array(set_array(x)) == x.
+
+Note: the test file test_lossless_format.nml is created in the current directory!
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+S1 = PS.Shemat_file(join(dirname(abspath(__file__)), "conv_ex_1.nml"))
+n = S1.idim * S1.jdim * S1.kdim
+
+np.random.seed(0)
+test_arrays = {
+    'uniform' : 10. + 90. * np.random.rand(n),
+    'porosity' : 0.001 * np.random.rand(n),
+    'log-normal' : np.exp(40. * np.random.randn(n)),
+    'negative' : -1e5 * np.random.rand(n),
+    'runs' : np.repeat(np.random.rand(n // 10 + 1), 10)[:n],
+    'integer' : np.random.randint(0, 1000, n).astype(float),
+    }
+
+all_ok = True
+for (label, x) in sorted(test_arrays.items()):
+    # explicit keyword
+    S1.set_array("# TEMP", x, float_type = 'lossless')
+    # format defined for the variable
+    S1.set_float_format("WLFM0", 'lossless')
+    S1.set_array("WLFM0", x[::-1])
+    S1.write_file("test_lossless_format")
+    S2 = PS.Shemat_file("test_lossless_format.nml")
+    ok = np.array_equal(S2.get_array("# TEMP"), x) and \
+         np.array_equal(S2.get_array("WLFM0"), x[::-1])
+    all_ok = all_ok and ok
+    print "%-12s %s" % (label, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
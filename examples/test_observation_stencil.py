@@ -0,0 +1,58 @@
+"""Test of the interpolation stencil for fixed observation points
+
+An ObservationStencil is created for random points in the example file
+temp_gradient.nlo, and the interpolated temperatures (for one and for several
+value sets at once) are compared with Shemat_file.get_value_xyz at each single
+point and with Shemat_file.get_values_xyz, for both treatments of the edge cells
+(edge = 'clamp', 'extrapolate'). Points outside of the model have to be NaN.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+np.random.seed(1)
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(0, 0, 0)
+geometry = S1.get_geometry()
+temp = S1.get_array("# TEMP")
+
+# interior points: between the outermost cell centres
+n = 100
+xs = np.random.uniform(geometry.centre_x[0], geometry.centre_x[-1], n)
+ys = np.random.uniform(geometry.centre_y[0], geometry.centre_y[-1], n)
+zs = np.random.uniform(geometry.centre_z[0], geometry.centre_z[-1], n)
+stencil = PS.ObservationStencil(S1, xs, ys, zs)
+ref = np.array([S1.get_value_xyz("# TEMP", x, y, z) for (x, y, z) in zip(xs, ys, zs)])
+ok = np.allclose(stencil.apply(temp), ref, rtol = 1e-12, atol = 0)
+all_ok = all_ok and ok
+print "%-34s %s" % ("single points", ok and "OK" or "FAILED")
+
+# several value sets (e.g. stochastic simulations) at once
+members = [temp, 2. * temp + 1., temp**2]
+values = stencil.apply(members)
+ok = values.shape == (len(members), n)
+for (member, value) in zip(members, values):
+    ok = ok and np.allclose(value, S1.get_values_xyz(member, xs, ys, zs), rtol = 1e-12, atol = 0)
+all_ok = all_ok and ok
+print "%-34s %s" % ("several value sets", ok and "OK" or "FAILED")
+
+# points in the edge cells and outside of the model
+xs_edge = np.append(np.random.uniform(geometry.boundaries_x[0], geometry.boundaries_x[-1], n), -1.)
+ys_edge = np.append(np.random.uniform(geometry.boundaries_y[0], geometry.boundaries_y[-1], n), ys[0])
+zs_edge = np.append(np.random.uniform(geometry.boundaries_z[0], geometry.boundaries_z[-1], n), zs[0])
+ok = True
+for edge in ('clamp', 'extrapolate'):
+    stencil = PS.ObservationStencil(S1, xs_edge, ys_edge, zs_edge, edge = edge)
+    values = stencil.apply(temp)
+    ref = S1.get_values_xyz("# TEMP", xs_edge, ys_edge, zs_edge, edge = edge)
+    ok = ok and np.allclose(values[:-1], ref[:-1], rtol = 1e-12, atol = 0) and \
+         np.isnan(values[-1]) and np.isnan(ref[-1])
+all_ok = all_ok and ok
+print "%-34s %s" % ("edge cells and outside points", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
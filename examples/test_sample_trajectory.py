@@ -0,0 +1,62 @@
+"""Test of sampling a property along a deviated well path
+
+Temperatures along a deviated well path in the example file temp_gradient.nlo
+are sampled with Shemat_file.sample_trajectory and compared with the values of
+Shemat_file.get_value_xyz (method 'trilinear') and of the cell determined with
+Shemat_file.get_array_pos_xyz (method 'nearest') at each sample point. The
+sample points have to lie on the path at the defined spacing, and points
+outside of the model have to be NaN.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(0, 0, 0)
+geometry = S1.get_geometry()
+temp = S1.get_array("# TEMP")
+
+# well path: vertical section, deviated section and horizontal section (between
+# the outermost cell centres)
+path = [(1520., 1480., 960.), (1520., 1480., 700.), (1900., 1700., 400.), (2400., 1700., 400.)]
+spacing = 25.
+(md, xs, ys, zs, values) = S1.sample_trajectory("# TEMP", path, spacing)
+path = np.array(path)
+length = np.sum(np.sqrt(np.sum(np.diff(path, axis=0)**2, axis=1)))
+ok = np.allclose(np.diff(md)[:-1], spacing) and np.diff(md)[-1] <= spacing and \
+     np.allclose(md[-1], length) and np.allclose((xs[-1], ys[-1], zs[-1]), path[-1])
+# points on path: the third vertex is at a measured depth of 260 + |(380, 220, -300)|
+md_vertex = 260. + np.sqrt(380.**2 + 220.**2 + 300.**2)
+on_segment = (md > 260.) & (md < md_vertex)
+t = (md[on_segment] - 260.) / (md_vertex - 260.)
+ok = ok and np.allclose(xs[on_segment], 1520. + t * 380.) and \
+     np.allclose(zs[on_segment], 700. - t * 300.)
+all_ok = all_ok and ok
+print "%-34s %s" % ("sample points", ok and "OK" or "FAILED")
+
+ref = [S1.get_value_xyz("# TEMP", x, y, z) for (x, y, z) in zip(xs, ys, zs)]
+ok = np.allclose(values, ref, rtol = 1e-12, atol = 0)
+all_ok = all_ok and ok
+print "%-34s %s" % ("trilinear", ok and "OK" or "FAILED")
+
+(md, xs, ys, zs, values) = S1.sample_trajectory("# TEMP", path, spacing, method = 'nearest')
+ref = [temp[S1.get_array_pos_xyz(x, y, z)] for (x, y, z) in zip(xs, ys, zs)]
+ok = np.array_equal(values, ref)
+all_ok = all_ok and ok
+print "%-34s %s" % ("nearest", ok and "OK" or "FAILED")
+
+# path leaving the model
+(md, xs, ys, zs, values) = S1.sample_trajectory("# TEMP", [(1500., 1500., 500.),
+                                                           (1500., 1500., 1500.)], spacing)
+inside = zs <= geometry.boundaries_z[-1]
+ok = not np.isnan(values[inside]).any() and np.isnan(values[~inside]).all() and \
+     (~inside).any()
+all_ok = all_ok and ok
+print "%-34s %s" % ("points outside of model", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -0,0 +1,67 @@
+"""Test of temperature gradient maps within one formation
+
+Temperature gradients within all formations of the example file temp_gradient.nlo
+are determined with Shemat_file.calc_formation_temp_gradient and compared with a
+loop over all columns: the gradient between the lowest and the highest cell of
+the formation (method 'interval') and the slope of a least-squares fit to the
+temperatures in all cells of the formation (method 'least_squares'). Locations
+where the formation does not exist or consists of only one cell have to be NaN.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+def temp_gradient_loop(S1, formation_id, method):
+    """temperature gradient with a loop over all columns"""
+    geology_xyz = S1.get_array_as_xyz_structure("GEOLOGY")
+    temp_xyz = S1.get_array_as_xyz_structure("# TEMP")
+    centre_z = S1.get_geometry().centre_z
+    temp_gradient_xy = []
+    for j in range(S1.jdim):
+        for i in range(S1.idim):
+            cells = [k for k in range(S1.kdim) if geology_xyz[i][j][k] == formation_id]
+            if len(cells) < 2:
+                temp_gradient_xy.append(np.nan)
+            elif method == 'interval':
+                (k_min, k_max) = (cells[0], cells[-1])
+                temp_gradient_xy.append((temp_xyz[i][j][k_max] - temp_xyz[i][j][k_min]) / \
+                                        (centre_z[k_min] - centre_z[k_max]))
+            else:
+                z = [centre_z[k] for k in cells]
+                t = [temp_xyz[i][j][k] for k in cells]
+                temp_gradient_xy.append(-np.polyfit(z, t, 1)[0])
+    return temp_gradient_xy
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(0, 0, 0)
+# remove formation 2 in one column and reduce it to one cell in another column
+geology = S1.get_array("GEOLOGY")
+layer = S1.idim * S1.jdim
+geology[3::layer][geology[3::layer] == 2] = 1
+cells = np.where(geology[7::layer] == 2)[0]
+geology[7 + layer * cells[1:]] = 1
+S1.set_array("GEOLOGY", geology)
+
+for method in ('interval', 'least_squares'):
+    ok = True
+    for formation_id in np.unique(S1.get_array("GEOLOGY")):
+        ref = temp_gradient_loop(S1, formation_id, method)
+        temp_gradient_xy = S1.calc_formation_temp_gradient(formation_id, method = method)
+        temp_gradient_array = S1.calc_formation_temp_gradient(formation_id, method = method,
+                                                              as_array = True)
+        ok = ok and type(temp_gradient_xy) == list and \
+             temp_gradient_array.shape == (S1.jdim, S1.idim) and \
+             np.allclose(temp_gradient_xy, ref, rtol = 1e-8, atol = 0, equal_nan = True) and \
+             np.allclose(temp_gradient_array.ravel(), ref, rtol = 1e-8, atol = 0, equal_nan = True)
+    temp_gradient_xy = S1.calc_formation_temp_gradient(2, method = method)
+    ok = ok and np.isnan(temp_gradient_xy[3]) and np.isnan(temp_gradient_xy[7]) and \
+         not np.isnan(temp_gradient_xy[5])
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("temp gradient (%s)" % method, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -0,0 +1,58 @@
+"""Test of transmissivity maps for all formations
+
+Transmissivities of all formations in the example file temp_gradient.nlo are
+determined with Shemat_file.calc_local_transmissivity and
+Shemat_file.calc_transmissivity_maps and compared with the loop over all cells of
+previous versions of calc_local_transmissivity: the hydraulic conductivity is
+calculated from permeability, density and viscosity in each cell of the formation
+and multiplied with the layer thickness (DELZ). The comparison is repeated for an
+irregular spacing in z-direction.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+def transmissivity_loop(S1, formation_id):
+    """transmissivity with a loop over all cells, as in previous versions"""
+    geology_xyz = S1.get_array_as_xyz_structure("GEOLOGY")
+    density_xyz = S1.get_array_as_xyz_structure("DICHTE")
+    permeability_xyz = S1.get_array_as_xyz_structure("PERM")
+    temp_xyz = S1.get_array_as_xyz_structure("TEMP")
+    g = 9.81 # grav acceleration
+    dz = S1.get_array("DELZ")
+    transmissivity_xy = []
+    for j in range(S1.jdim):
+        for i in range(S1.idim):
+            local_transmissivity = 0
+            for k in range(S1.kdim):
+                if geology_xyz[i][j][k] == formation_id:
+                    K = permeability_xyz[i][j][k] * density_xyz[i][j][k] * g / \
+                        S1.mu(temp_xyz[i][j][k])
+                    local_transmissivity += K * dz[k]
+            transmissivity_xy.append(local_transmissivity)
+    return transmissivity_xy
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+for grid in ("regular", "irregular"):
+    if grid == "irregular":
+        S1.set_array("DELZ", np.linspace(20., 80., S1.kdim), float_type = 'lossless')
+    (formation_ids, transmissivity) = S1.calc_transmissivity_maps()
+    ok = np.array_equal(formation_ids, np.unique(S1.get_array("GEOLOGY"))) and \
+         transmissivity.shape == (len(formation_ids), S1.jdim, S1.idim)
+    for (n, formation_id) in enumerate(formation_ids):
+        ref = transmissivity_loop(S1, formation_id)
+        transmissivity_xy = S1.calc_local_transmissivity(formation_id)
+        transmissivity_array = S1.calc_local_transmissivity(formation_id, as_array = True)
+        ok = ok and type(transmissivity_xy) == list and max(ref) > 0 and \
+             np.allclose(transmissivity_xy, ref, rtol = 1e-10, atol = 0) and \
+             np.allclose(transmissivity_array.ravel(), ref, rtol = 1e-10, atol = 0) and \
+             np.allclose(transmissivity[n].ravel(), ref, rtol = 1e-10, atol = 0)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("transmissivity (%s)" % grid, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -36,6 +36,9 @@ S1.set_origin(0, 0, 0)
 # Get interpolated value (real-world projected coordinates)
 print S1.get_value_xyz("TEMP", 150,140,150)
 
+# Same value with the vectorized method (for many points at once)
+print S1.get_values_xyz("TEMP", [150], [140], [150])[0]
+
 
 
 
@@ -0,0 +1,48 @@
+"""Test of the file format of written SHEMAT files
+
+A model is created with PySHEMAT.create_empty_model and written to a file, and the
+example file conv_ex_1.nml is read (normally and lazily), changed and written
+again. The header lines and the whitespace-only lines (e.g. the empty line at
+the end of the file) of the written files have to be the same as in the example
+file conv_ex_1.nml, and changed arrays have to be read back correctly. After
+writing, the object has to contain the written values and no changed arrays.
+
+Note: the test files test_write_format*.nml are created in the current directory!
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "conv_ex_1.nml")
+
+def format_lines(filename):
+    """header and whitespace-only lines of a SHEMAT file"""
+    return [l for l in open(filename) if l.startswith("#") or l.strip() == ""]
+
+all_ok = True
+
+# new model from template
+S1 = PS.create_empty_model(dx = 5 * [10.], dy = 4 * [10.], dz = 3 * [10.],
+                           nml_filename = 'test_write_format_empty')
+ok = format_lines("test_write_format_empty.nml") == format_lines(example_file)
+all_ok = all_ok and ok
+print "%-24s %s" % ("create_empty_model", ok and "OK" or "FAILED")
+
+# round trip with changed arrays, also for the last variable in the file
+for lazy in (False, True):
+    S1 = PS.Shemat_file(example_file, lazy = lazy)
+    n = S1.idim * S1.jdim * S1.kdim
+    temp = 10. + 0.01 * np.arange(n)
+    S1.set_array("# TEMP", temp, float_type = 'lossless')
+    S1.set_array("AREAKT", np.ones(n), float_type = 'lossless')
+    S1.write_file("test_write_format")
+    S2 = PS.Shemat_file("test_write_format.nml")
+    ok = format_lines("test_write_format.nml") == format_lines(example_file) and \
+         np.array_equal(S2.get_array("# TEMP"), temp) and \
+         np.array_equal(S2.get_array("AREAKT"), np.ones(n)) and \
+         S1.dirty_vars == {} and S1.get_var_lines("# TEMP") == S2.get_var_lines("# TEMP")
+    all_ok = all_ok and ok
+    print "%-24s %s" % ("round trip (lazy=%s)" % lazy, ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
@@ -0,0 +1,70 @@
+"""Test of the interpolation of scattered data onto the (x,y) grid of a model
+
+Values at random (x,y) data points are interpolated onto the grid of the example
+file temp_gradient.nlo with Shemat_file.interpolate_values_on_xy_grid (see
+PySHEMAT.XYGridInterpolator) and compared with scipy.interpolate.griddata on the
+same grid points (replacement of matplotlib.mlab.griddata, used in previous
+versions of PySHEMAT), for linear and nearest neighbour interpolation. Linear
+functions have to be reproduced exactly within the convex hull of the data
+points, and the interpolation weights have to be reused for the same data points.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from scipy.interpolate import griddata
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+np.random.seed(1)
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+S1.set_origin(1000., 2000., 0.)
+geometry = S1.get_geometry()
+n = 60
+x_coords = S1.origin_x + np.random.uniform(-200., geometry.extent_x + 200., n)
+y_coords = S1.origin_y + np.random.uniform(-200., geometry.extent_y + 200., n)
+surface_temp = 10. + 0.002 * (x_coords - S1.origin_x) - 0.001 * (y_coords - S1.origin_y)
+heat_flow = np.random.uniform(0.05, 0.08, n)
+
+# grid points, as in interpolate_values_on_xy_grid
+xi = np.linspace(S1.origin_x, S1.origin_x + geometry.extent_x, geometry.idim)
+yi = np.linspace(S1.origin_y, S1.origin_y + geometry.extent_y, geometry.jdim)
+(xi, yi) = np.meshgrid(xi, yi)
+grid_points = (xi.ravel(), yi.ravel())
+
+for method in ('linear', 'nearest'):
+    ok = True
+    for z_values in (surface_temp, heat_flow):
+        zi = S1.interpolate_values_on_xy_grid(x_coords, y_coords, z_values, method = method)
+        ref = griddata((x_coords, y_coords), z_values, grid_points, method = method)
+        ok = ok and zi.shape == (geometry.idim * geometry.jdim,) and \
+             np.array_equal(np.isnan(zi), np.isnan(ref)) and \
+             np.allclose(zi[~np.isnan(ref)], ref[~np.isnan(ref)], rtol = 1e-10, atol = 0)
+    # several value sets at once
+    zi = S1.xy_grid_interpolator.interpolate([surface_temp, heat_flow])
+    ok = ok and zi.shape == (2, geometry.idim * geometry.jdim) and \
+         np.allclose(zi[1], S1.interpolate_values_on_xy_grid(x_coords, y_coords, heat_flow,
+                                                              method = method), equal_nan = True)
+    all_ok = all_ok and ok
+    print "%-34s %s" % ("griddata (%s)" % method, ok and "OK" or "FAILED")
+
+# linear function is reproduced exactly within the convex hull of the data points
+zi = S1.interpolate_values_on_xy_grid(x_coords, y_coords, surface_temp)
+exact = 10. + 0.002 * (xi.ravel() - S1.origin_x) - 0.001 * (yi.ravel() - S1.origin_y)
+ok = not np.isnan(zi).all() and \
+     np.allclose(zi[~np.isnan(zi)], exact[~np.isnan(zi)], rtol = 1e-10, atol = 0)
+all_ok = all_ok and ok
+print "%-34s %s" % ("linear function", ok and "OK" or "FAILED")
+
+# weights are reused for the same data points and determined again for new points
+interpolator = S1.xy_grid_interpolator
+S1.interpolate_values_on_xy_grid(x_coords, y_coords, heat_flow)
+ok = S1.xy_grid_interpolator is interpolator
+S1.interpolate_values_on_xy_grid(x_coords[:-1], y_coords[:-1], heat_flow[:-1])
+ok = ok and S1.xy_grid_interpolator is not interpolator
+all_ok = all_ok and ok
+print "%-34s %s" % ("reuse of weights", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"
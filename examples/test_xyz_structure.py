@@ -0,0 +1,71 @@
+"""Test of the x,y,z structures of SHEMAT arrays (data[i][j][k])
+
+The temperatures of the example file temp_gradient.nlo are restructured with
+Shemat_file.get_array_as_xyz_structure, Shemat_file.array_to_xyz_structure and
+Shemat_file.array_to_xyz_structure_object and compared with the nested lists
+created with the loops of previous versions of PySHEMAT. Arrays set with
+Shemat_file.set_array_from_xyz_structure (from the returned structures and from
+nested lists) have to be the same as the original array.
+"""
+
+import PySHEMAT as PS
+import numpy as np
+from os.path import join, dirname, abspath
+
+example_file = join(dirname(abspath(__file__)), "temp_gradient.nlo")
+
+def xyz_structure_loop(array, idim, jdim, kdim):
+    """nested lists data[i][j][k], as in previous versions of array_to_xyz_structure"""
+    data = []
+    n = 0
+    for i in range(idim):
+        tmp2 = []
+        for j in range(jdim):
+            tmp = [0 for k in range(kdim)]
+            tmp2.append(tmp)
+        data.append(tmp2)
+    for k in range(kdim):
+        for j in range(jdim):
+            for i in range(idim):
+                data[i][j][k] = array[n]
+                n += 1
+    return data
+
+all_ok = True
+
+S1 = PS.Shemat_file(example_file)
+temp = S1.get_array("# TEMP")
+ref = xyz_structure_loop(temp, S1.idim, S1.jdim, S1.kdim)
+
+ok = True
+for data in (S1.get_array_as_xyz_structure("# TEMP"),
+             S1.array_to_xyz_structure(temp, S1.idim, S1.jdim, S1.kdim),
+             S1.array_to_xyz_structure_object(temp),
+             S1.array_to_xyz_structure(temp.tolist(), S1.idim, S1.jdim, S1.kdim)):
+    ok = ok and np.array_equal(data, ref) and data[3][5][7] == ref[3][5][7]
+all_ok = all_ok and ok
+print "%-34s %s" % ("xyz structures", ok and "OK" or "FAILED")
+
+# structure of a numpy array is a view (no copy)
+data = S1.array_to_xyz_structure(temp, S1.idim, S1.jdim, S1.kdim)
+data[3][5][7] = -1.
+ok = temp[3 + S1.idim * 5 + S1.idim * S1.jdim * 7] == -1. and \
+     S1.get_array("# TEMP")[3 + S1.idim * 5 + S1.idim * S1.jdim * 7] != -1.
+all_ok = all_ok and ok
+print "%-34s %s" % ("view of array", ok and "OK" or "FAILED")
+
+# dimensions not consistent with array size
+ok = S1.array_to_xyz_structure(temp, S1.idim + 1, S1.jdim, S1.kdim) is None
+all_ok = all_ok and ok
+print "%-34s %s" % ("inconsistent dimensions", ok and "OK" or "FAILED")
+
+ok = True
+temp = S1.get_array("# TEMP")
+for data in (S1.get_array_as_xyz_structure("# TEMP"), ref):
+    S1.set_array("# TEMP", np.zeros(len(temp)))
+    S1.set_array_from_xyz_structure("# TEMP", data, float_type = 'lossless')
+    ok = ok and np.array_equal(S1.get_array("# TEMP"), temp)
+all_ok = all_ok and ok
+print "%-34s %s" % ("set_array_from_xyz_structure", ok and "OK" or "FAILED")
+
+print all_ok and "All tests passed" or "Test FAILED"